@@ -1,18 +1,103 @@
-from pyairtable import Table
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
 from datetime import datetime
+from fragment import Fragment
+from pipeline import batched
+from rate_limiter import RateLimiter
 from tqdm import tqdm
 
+
+def _create_api(api_key, **kwargs):
+    """Create a pyairtable Api; pyairtable (and pydantic) are only imported once a client is built."""
+    from pyairtable import Api as PyairtableApi
+    return PyairtableApi(api_key, **kwargs)
+
+
+def shared_api(api_key=None, connections=10):
+    """
+    Create one pyairtable Api whose pooled HTTP session serves several AirtableClients.
+
+    Args:
+        api_key (str, optional): Airtable token, Config.AIRTABLE_API_KEY by default
+        connections (int): Keep-alive connections pooled per host, at least the number
+            of threads making requests at once
+
+    Returns:
+        pyairtable.Api: Pass as AirtableClient(api=...)
+    """
+    from requests.adapters import HTTPAdapter
+
+    api = _create_api(api_key or Config.AIRTABLE_API_KEY, endpoint_url=Config.AIRTABLE_ENDPOINT_URL)
+    for prefix in ('https://', 'http://'):
+        # Keep pyairtable's retry strategy, only widen the connection pool
+        retries = api.session.get_adapter(prefix).max_retries
+        api.session.mount(prefix, HTTPAdapter(pool_connections=connections, pool_maxsize=connections,
+                                              max_retries=retries))
+    return api
+
+
+def merge_comments(record, comments):
+    """Prepend a record's Airtable comments to its content as grey "Q:" lines."""
+    if len(comments) > 0:
+        joint_comments = "\n".join([("Q: " + text) for text in comments])
+        record['content'] = '<span style="color:#AFABAB;mso-style-textfill-fill-color:#AFABAB;">'+joint_comments + "</span>\n\n" + record['content']
+    return record
+
+
+def read_stored_records(store, modified_since=None, fragment_ids=None, attributes=None, query=None):
+    """
+    Read records from a synced RecordStore, shaped like AirtableClient.get_records() output.
+
+    Needs no Airtable credentials, so selecting from the store works offline.
+
+    Args:
+        store (RecordStore): Local store previously updated by AirtableClient.sync()
+        modified_since (datetime, optional): Only return records modified on or after this date.
+        fragment_ids (list, optional): Only return records with these sequence IDs.
+        attributes (list, optional): Only return records tagged with one of these attributes.
+        query (str, optional): Only return records matching this full-text query (see RecordStore.search).
+
+    Returns:
+        list: List of records with comments merged into content.
+    """
+    return [
+        merge_comments(Fragment.from_dict(record), comments)
+        for record, comments in store.get_records(modified_since=modified_since, fragment_ids=fragment_ids,
+                                                  attributes=attributes, query=query)
+    ]
+
+
+def _escape_formula_string(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"')
+
+
 class AirtableClient:
-    def __init__(self):
-        """Initialize the Airtable client with configuration."""
-        Config.validate()
-        self.api = Api(Config.AIRTABLE_API_KEY)
-        self.table = Table(
-            Config.AIRTABLE_API_KEY,
-            Config.AIRTABLE_BASE_ID,
-            Config.AIRTABLE_TABLE_ID
-        )
+    def __init__(self, base_id=None, table_id=None, api=None, rate_limiter=None):
+        """
+        Initialize the Airtable client with configuration.
+
+        Args:
+            base_id (str, optional): Base to read, Config.AIRTABLE_BASE_ID by default
+            table_id (str, optional): Table to read, Config.AIRTABLE_TABLE_ID by default
+            api (pyairtable.Api, optional): API object (and HTTP session) shared with other
+                clients, see shared_api()
+            rate_limiter (RateLimiter, optional): Limiter shared by all clients of the same base
+        """
+        if base_id is None or table_id is None:
+            Config.validate()
+        elif api is None and not Config.AIRTABLE_API_KEY:
+            raise ValueError("Missing required configuration: AIRTABLE_API_KEY")
+        self.api = api or _create_api(Config.AIRTABLE_API_KEY, endpoint_url=Config.AIRTABLE_ENDPOINT_URL)
+        self.table = self.api.table(base_id or Config.AIRTABLE_BASE_ID, table_id or Config.AIRTABLE_TABLE_ID)
+        self.rate_limiter = rate_limiter or RateLimiter(Config.AIRTABLE_REQUESTS_PER_SECOND)
+
+        # Counters for the run report; updated from the comment worker threads too
+        self.stats = {"http_requests": 0, "http_retries": 0, "list_pages": 0, "comment_calls": 0,
+                      "records": 0, "fetch_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+        self.api.session.hooks['response'].append(self._count_response)
 
         self.required_fields = [
             Config.FIELD_TITLE,
@@ -22,6 +107,21 @@ class AirtableClient:
             Config.FIELD_LAST_MODIFIED
         ]
 
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _count_response(self, response, *args, **kwargs):
+        # A shared session reports every client's responses to every client's hook
+        if not response.url.startswith(self.table.url):
+            return
+        # urllib3 retries (e.g. on 429) happen below requests; their history rides on the raw response
+        retries = getattr(response.raw, 'retries', None)
+        retried = len(retries.history) if retries is not None else 0
+        self._count("http_requests", 1 + retried)
+        if retried:
+            self._count("http_retries", retried)
+
     def _validate_record(self, record):
         fields = record['fields']
         
@@ -33,24 +133,25 @@ class AirtableClient:
             raise ValueError(f"Record {record['id']} is missing required fields: {', '.join(missing_fields)}")
         
         # Create validated record with all required fields
-        validated_record = {
-            'id': record['id'],
-            'title': fields[Config.FIELD_TITLE],
-            'sequence': fields[Config.FIELD_SEQUENCE],
-            'attribute1': fields[Config.FIELD_ATTRIBUTE1],
-            'content': fields[Config.FIELD_CONTENT],
-            'last_modified': datetime.fromisoformat(fields[Config.FIELD_LAST_MODIFIED].replace('Z', '+00:00'))
-        }
+        validated_record = Fragment(
+            id=record['id'],
+            title=fields[Config.FIELD_TITLE],
+            sequence=fields[Config.FIELD_SEQUENCE],
+            attribute1=fields[Config.FIELD_ATTRIBUTE1],
+            content=fields[Config.FIELD_CONTENT],
+            last_modified=datetime.fromisoformat(fields[Config.FIELD_LAST_MODIFIED].replace('Z', '+00:00'))
+        )
 
         return validated_record
 
-    def get_records(self, modified_since=None, fragment_ids=None):
+    def get_records(self, modified_since=None, fragment_ids=None, attributes=None):
         """
         Fetch records from the configured Airtable table.
         
         Args:
             modified_since (datetime, optional): If provided, only return records modified on or after this date.
             fragment_ids (list, optional): If provided, only return records with these sequence IDs.
+            attributes (list, optional): If provided, only return records tagged with one of these attributes.
             
         Returns:
             list: List of records with required fields.
@@ -58,34 +159,235 @@ class AirtableClient:
         Raises:
             ValueError: If required fields are missing from records.
         """
+        return list(self.iter_records(modified_since=modified_since, fragment_ids=fragment_ids, attributes=attributes))
+
+    def iter_records(self, modified_since=None, fragment_ids=None, attributes=None):
+        """
+        Fetch records page by page, yielding each one as soon as its page is enriched with comments.
+
+        Filters too large for one formula are split by _plan_formulas; the batches
+        are fetched concurrently, merged and put in Airtable's order before
+        comments are added.
+
+        Args:
+            modified_since (datetime, optional): If provided, only return records modified on or after this date.
+            fragment_ids (list, optional): If provided, only return records with these sequence IDs.
+            attributes (list, optional): If provided, only return records tagged with one of these attributes.
+
+        Yields:
+            dict: Validated record with comments merged into content, in table order.
+
+        Raises:
+            ValueError: If required fields are missing from records.
+        """
+        formulas = self._plan_formulas(modified_since=modified_since, fragment_ids=fragment_ids, attributes=attributes)
+        if len(formulas) == 1:
+            pages = self._iterate_pages(formula=formulas[0], fields=self.required_fields,
+                                        sort=[f"{Config.FIELD_ATTRIBUTE1}"])
+        else:
+            # Same page size as Airtable's, so comments are still fetched 100 records at a time
+            pages = batched(self._fetch_batches(formulas, modified_since=modified_since), 100)
+        for page in pages:
+            validated_records = [self._validate_record(record) for record in page]
+            start = time.perf_counter()
+            all_comments = self._fetch_comments([record['id'] for record in validated_records], progress=False)
+            self._count("fetch_seconds", time.perf_counter() - start)
+            self._count("records", len(validated_records))
+
+            for validated_record, comments in zip(validated_records, all_comments):
+                yield merge_comments(validated_record, comments)
+
+    def _iterate_pages(self, **options):
+        """Page through a list query; every page request waits for the rate limiter and counts as a list page."""
+        pages = self.table.iterate(**options)
+        while True:
+            self.rate_limiter.acquire()
+            start = time.perf_counter()
+            page = next(pages, None)
+            self._count("fetch_seconds", time.perf_counter() - start)
+            if page is None:
+                return
+            self._count("list_pages")
+            yield page
+
+    def _fetch_batches(self, formulas, modified_since=None):
+        """
+        Run several list queries concurrently and merge them.
+
+        A record matching more than one batch (e.g. tagged with two requested
+        attributes) is returned once. Airtable's sort only holds within a batch,
+        and it orders the multi-select by option order, which cannot be
+        reproduced locally; so the merged records are put in the order of one
+        sorted ID listing, fetched alongside the batches.
+
+        Returns:
+            list: Raw Airtable records, in the order of an unbatched query
+        """
+        def fetch(formula):
+            pages = self._iterate_pages(formula=formula, fields=self.required_fields, sort=[Config.FIELD_ATTRIBUTE1])
+            return [record for page in pages for record in page]
+
+        unique = {}
+        batches, positions = self._run_batches(fetch, formulas, modified_since=modified_since)
+        for batch in batches:
+            for record in batch:
+                unique.setdefault(record['id'], record)
+        # Records changed between the listings go last rather than being dropped
+        return sorted(unique.values(), key=lambda record: positions.get(record['id'], len(positions)))
+
+    def _run_batches(self, function, formulas, modified_since=None):
+        """
+        Run function on every formula concurrently, together with one ID listing in Airtable's sort.
+
+        Returns:
+            tuple: Results in formula order, and the position of every listed record ID
+        """
+        with ThreadPoolExecutor(max_workers=max(1, Config.QUERY_WORKERS) + 1) as executor:
+            # modified_since keeps the listing as small as the batches allow; it does not change the order
+            order = executor.submit(self._list_ids, self._build_formula(modified_since=modified_since))
+            results = list(executor.map(function, formulas))
+            return results, {record_id: position for position, record_id in enumerate(order.result())}
+
+    def _list_ids(self, formula):
+        """Record IDs matching formula, in Airtable's attribute sort (only the short Last modified column is sent)."""
+        options = {"fields": [Config.FIELD_LAST_MODIFIED], "sort": [Config.FIELD_ATTRIBUTE1]}
+        if formula:
+            options["formula"] = formula
+        return [record['id'] for page in self._iterate_pages(**options) for record in page]
+
+    def _plan_formulas(self, modified_since=None, fragment_ids=None, attributes=None):
+        """
+        Split a filter into formulas small enough for Airtable to evaluate quickly.
+
+        Fragment IDs and attribute values are cut into batches of at most
+        Config.FORMULA_BATCH_SIZE clauses. Every ID batch is combined with every
+        attribute batch, and each formula keeps the modified_since bound.
+
+        Returns:
+            list: Formula strings, [""] when nothing is filtered
+        """
+        size = max(1, Config.FORMULA_BATCH_SIZE)
+        id_list = sorted(fragment_ids) if fragment_ids else []
+        attribute_list = list(attributes) if attributes else []
+        id_batches = [id_list[i:i + size] for i in range(0, len(id_list), size)] or [None]
+        attribute_batches = [attribute_list[i:i + size] for i in range(0, len(attribute_list), size)] or [None]
+        return [
+            self._build_formula(modified_since=modified_since, fragment_ids=ids, attributes=values)
+            for ids in id_batches
+            for values in attribute_batches
+        ]
+
+    def _build_formula(self, modified_since=None, fragment_ids=None, attributes=None):
         formula_parts = []
         if fragment_ids:
             formula_parts.append("OR(" + ",".join(f"{{Порядковый номер}}={seq}" for seq in fragment_ids) + ")")
+        if attributes:
+            # Exact match against the multi-select values: FIND("|value|", "|a|b|")
+            joined = f'"|" & ARRAYJOIN({{{Config.FIELD_ATTRIBUTE1}}}, "|") & "|"'
+            formula_parts.append("OR(" + ",".join(
+                f'FIND("|{_escape_formula_string(value)}|", {joined})' for value in attributes
+            ) + ")")
         if modified_since:
             formula_parts.append(f"IS_AFTER({{Last modified time}}, DATETIME_PARSE('{modified_since}'))")
-        formula = "AND(" + ",".join(formula_parts) + ")" if len(formula_parts) > 1 else (formula_parts[0] if formula_parts else "")
+        return "AND(" + ",".join(formula_parts) + ")" if len(formula_parts) > 1 else (formula_parts[0] if formula_parts else "")
 
-        records = self.table.all(formula=formula, sort=[f"{Config.FIELD_ATTRIBUTE1}"])
+    def sync(self, store, full=False):
+        """
+        Bring a local RecordStore up to date with Airtable.
 
-        validated_records = []
-        
-        for record in tqdm(records, desc="Processing Airtable records"):
-            validated_record = self._validate_record(record)
+        Only records modified on or after the store's high-water mark are
+        downloaded (with their comments); records that no longer exist in
+        Airtable are removed from the store. Comments added without touching
+        the record itself are only picked up by a full sync.
 
-            comments = self.table.comments(record['id'])
-            if len(comments) > 0:
-                joint_comments = "\n".join([("Q: " + comment.text) for comment in comments])
-                validated_record['content'] = '<span style="color:#AFABAB;mso-style-textfill-fill-color:#AFABAB;">'+joint_comments + "</span>\n\n" + validated_record['content']
-                
-            validated_records.append(validated_record)
-                
-        return validated_records
+        Args:
+            store (RecordStore): Local store to update
+            full (bool): Re-download every record regardless of the high-water mark
 
-    def get_record_count(self):
+        Returns:
+            dict: Number of updated and deleted records
         """
-        Get the total number of records in the table.
-        
+        ordered_ids = self.list_record_ids()
+
+        high_water = None if full else store.high_water_mark()
+        formula = ""
+        if high_water:
+            # Inclusive bound: records sharing the mark's timestamp are re-fetched rather than missed
+            formula = f"NOT(IS_BEFORE({{Last modified time}}, DATETIME_PARSE('{high_water.isoformat()}')))"
+        changed = [
+            self._validate_record(record)
+            for page in self._iterate_pages(formula=formula, fields=self.required_fields)
+            for record in page
+        ]
+        all_comments = self._fetch_comments([record['id'] for record in changed])
+
+        for record, comments in zip(changed, all_comments):
+            store.upsert(record, comments)
+
+        deleted = store.record_ids() - set(ordered_ids)
+        store.delete(deleted)
+        store.set_order(ordered_ids)
+
+        return {"updated": len(changed), "deleted": len(deleted)}
+
+    def _fetch_record_comments(self, record_id):
+        self.rate_limiter.acquire()
+        self._count("comment_calls")
+        return [comment.text for comment in self.table.comments(record_id)]
+
+    def _fetch_comments(self, record_ids, progress=True):
+        """
+        Fetch comments for several records concurrently.
+
+        Args:
+            record_ids (list): Airtable record IDs.
+            progress (bool): Show a progress bar.
+
+        Returns:
+            list: Lists of comment texts in the same order as record_ids.
+        """
+        workers = max(1, Config.COMMENT_WORKERS)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(tqdm(
+                executor.map(self._fetch_record_comments, record_ids),
+                total=len(record_ids),
+                desc="Fetching Airtable comments",
+                disable=not progress
+            ))
+
+    def list_record_ids(self, modified_since=None, fragment_ids=None, attributes=None):
+        """
+        List the IDs of matching records without downloading their content.
+
+        Airtable returns every column unless fields are named, so only the short
+        Last modified time column is requested.
+
+        Args:
+            modified_since (datetime, optional): Only list records modified on or after this date.
+            fragment_ids (list, optional): Only list records with these sequence IDs.
+            attributes (list, optional): Only list records tagged with one of these attributes.
+
+        Returns:
+            list: Record IDs in table order (sorted by attribute), also when the filter is batched.
+        """
+        formulas = self._plan_formulas(modified_since=modified_since, fragment_ids=fragment_ids, attributes=attributes)
+        if len(formulas) == 1:
+            return self._list_ids(formulas[0])
+        batches, positions = self._run_batches(self._list_ids, formulas, modified_since=modified_since)
+        unique = {record_id for batch in batches for record_id in batch}
+        return sorted(unique, key=lambda record_id: positions.get(record_id, len(positions)))
+
+    def get_record_count(self, modified_since=None, fragment_ids=None, attributes=None):
+        """
+        Get the number of matching records in the table.
+
+        Args:
+            modified_since (datetime, optional): Only count records modified on or after this date.
+            fragment_ids (list, optional): Only count records with these sequence IDs.
+            attributes (list, optional): Only count records tagged with one of these attributes.
+
         Returns:
             int: Number of records.
         """
-        return len(self.table.all())
+        return len(self.list_record_ids(modified_since=modified_since, fragment_ids=fragment_ids,
+                                        attributes=attributes))
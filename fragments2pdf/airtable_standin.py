@@ -0,0 +1,267 @@
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from config import Config
+
+COMMENT_SPAN = re.compile(r'^<span style="color:#AFABAB;[^"]*">(.*?)</span>\n\n', re.DOTALL)
+STANDIN_AUTHOR = {"id": "usr0000standin", "email": "standin@example.com", "name": "Airtable stand-in"}
+
+
+def _to_airtable_time(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+def records_from_clean_json(records):
+    """
+    Turn records in the records_clean.json shape back into raw Airtable records and comments.
+
+    Comments merged into content by AirtableClient are split out again, so the
+    stand-in serves them from the comments endpoint like the real API does.
+
+    Args:
+        records (list): Records as written to output/records_clean.json
+
+    Returns:
+        tuple: (raw records, dict of record id to raw comments)
+    """
+    raw_records = []
+    raw_comments = {}
+    for record in records:
+        content = record['content']
+        texts = []
+        match = COMMENT_SPAN.match(content)
+        if match:
+            texts = match.group(1)[len("Q: "):].split("\nQ: ")
+            content = content[match.end():]
+
+        last_modified = _to_airtable_time(record['last_modified'])
+        raw_records.append({
+            'id': record['id'],
+            'createdTime': last_modified,
+            'fields': {
+                Config.FIELD_TITLE: record['title'],
+                Config.FIELD_SEQUENCE: record['sequence'],
+                Config.FIELD_ATTRIBUTE1: record['attribute1'],
+                Config.FIELD_CONTENT: content,
+                Config.FIELD_LAST_MODIFIED: last_modified,
+            }
+        })
+        raw_comments[record['id']] = [
+            {
+                'id': f"com{record['id'][3:]}{index:03d}",
+                'author': STANDIN_AUTHOR,
+                'text': text,
+                'createdTime': last_modified,
+                'lastUpdatedTime': None,
+                'mentioned': {},
+            }
+            for index, text in enumerate(texts)
+        ]
+    return raw_records, raw_comments
+
+
+def record_session(table, path):
+    """
+    Record the raw list-records and comments responses of a real table into a fixture file.
+
+    Args:
+        table (pyairtable.Table): Table to record
+        path (str): Where to write the session JSON
+    """
+    records = table.all()
+    comments = {
+        record['id']: [
+            page_comment
+            for page in table.api.iterate_requests("GET", table.record_url(record['id'], "comments"))
+            for page_comment in page["comments"]
+        ]
+        for record in records
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'records': records, 'comments': comments}, f, ensure_ascii=False)
+
+
+class AirtableStandIn:
+    def __init__(self, records, comments=None, latency=0.0, page_size=100, rate_limit_every=0):
+        """
+        Initialize a local HTTP server imitating the Airtable list-records and comments endpoints.
+
+        Formulas and sorting are not evaluated: records are served in the order given,
+        which for records_clean.json already matches the pipeline's attribute sort.
+
+        Args:
+            records (list): Raw Airtable records ({'id', 'createdTime', 'fields'})
+            comments (dict, optional): Record id to list of raw comments
+            latency (float): Seconds to sleep before answering each request
+            page_size (int): Maximum records per list page (Airtable caps this at 100)
+            rate_limit_every (int): Answer every Nth request with 429; 0 disables injection
+        """
+        self.records = records
+        self.comments = comments or {}
+        self.latency = latency
+        self.page_size = page_size
+        self.rate_limit_every = rate_limit_every
+        self.stats = {"requests": 0, "rate_limited": 0, "bytes_sent": 0}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """
+        Create a stand-in seeded from records_clean.json or a recorded session file.
+
+        Args:
+            path (str): Path to the seed file
+            **kwargs: Passed to the constructor
+
+        Returns:
+            AirtableStandIn: Configured (not yet started) stand-in
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return cls(data['records'], data.get('comments'), **kwargs)
+        records, comments = records_from_clean_json(data)
+        return cls(records, comments, **kwargs)
+
+    @property
+    def endpoint_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, host='127.0.0.1', port=0):
+        """
+        Start serving in a background thread.
+
+        Returns:
+            str: Endpoint URL to use as Config.AIRTABLE_ENDPOINT_URL
+        """
+        handler = type('StandInHandler', (_StandInHandler,), {'standin': self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.endpoint_url
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _admit(self):
+        """Count a request and decide whether it gets a 429."""
+        with self._lock:
+            self.stats["requests"] += 1
+            limited = bool(self.rate_limit_every) and self.stats["requests"] % self.rate_limit_every == 0
+            if limited:
+                self.stats["rate_limited"] += 1
+        return not limited
+
+    def list_page(self, params):
+        requested = int(params.get('pageSize', [self.page_size])[0])
+        page_size = max(1, min(requested, self.page_size))
+        start = int(params.get('offset', ['0'])[0] or 0)
+        fields = params.get('fields[]') or params.get('fields')
+
+        page = self.records[start:start + page_size]
+        if fields:
+            page = [
+                {**record, 'fields': {k: v for k, v in record['fields'].items() if k in fields}}
+                for record in page
+            ]
+        response = {'records': page}
+        if start + page_size < len(self.records):
+            response['offset'] = str(start + page_size)
+        return response
+
+    def comments_page(self, record_id):
+        return {'comments': self.comments.get(record_id, []), 'offset': None}
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    standin = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        with self.standin._lock:
+            self.standin.stats["bytes_sent"] += len(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, params):
+        standin = self.standin
+        if standin.latency:
+            time.sleep(standin.latency)
+        if not standin._admit():
+            self._send(429, {'errors': [{'error': 'RATE_LIMIT_REACHED'}]})
+            return
+
+        parts = [unquote(part) for part in urlparse(self.path).path.strip('/').split('/')]
+        # v0/{base}/{table}[/listRecords | /{record_id}/comments]
+        if len(parts) == 3 or (len(parts) == 4 and parts[3] == 'listRecords'):
+            self._send(200, standin.list_page(params))
+        elif len(parts) == 5 and parts[4] == 'comments':
+            self._send(200, standin.comments_page(parts[3]))
+        else:
+            self._send(404, {'error': 'NOT_FOUND'})
+
+    def do_GET(self):
+        self._handle(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        params = parse_qs(urlparse(self.path).query)
+        params.update({key: value if isinstance(value, list) else [value] for key, value in body.items()})
+        self._handle(params)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve a local stand-in for the Airtable API')
+    parser.add_argument('--seed', default='output/records_clean.json',
+                        help='records_clean.json or a recorded session file')
+    parser.add_argument('--record', metavar='PATH',
+                        help='Record the configured Airtable table into PATH and exit')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--rate-limit-every', type=int, default=0,
+                        help='Answer every Nth request with HTTP 429')
+    args = parser.parse_args()
+
+    if args.record:
+        from airtable_client import AirtableClient
+        record_session(AirtableClient().table, args.record)
+        print(f"Recorded session saved to: {args.record}")
+    else:
+        standin = AirtableStandIn.from_file(args.seed, latency=args.latency, page_size=args.page_size,
+                                            rate_limit_every=args.rate_limit_every)
+        endpoint_url = standin.start(port=args.port)
+        print(f"Serving {len(standin.records)} records at {endpoint_url}")
+        print(f"Run the pipeline with AIRTABLE_ENDPOINT_URL={endpoint_url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            standin.stop()
@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_SEED_PATH = os.path.join('output', 'records_clean.json')
+DEFAULT_RESULTS_PATH = os.path.join('output', 'benchmark_results.jsonl')
+DEFAULT_SIZES = [1000, 10000, 100000]
+ALL_STAGES = ['fetch', 'convert', 'fit', 'render', 'pdf']
+DEFAULT_STAGES = ['convert', 'fit', 'render', 'pdf']
+
+WORD = re.compile(r'[А-Яа-яЁё]+')
+COMMENT_SPAN = re.compile(r'^<span style="color:#AFABAB;[^"]*">(.*?)</span>\n\n', re.DOTALL)
+
+
+class CorpusGenerator:
+    def __init__(self, seed_records, seed=0):
+        """
+        Generate synthetic fragments shaped like a real corpus.
+
+        Each synthetic record copies the structure of a randomly chosen seed
+        record (Markdown markup, paragraph breaks, length, attribute list and
+        merged comments) and replaces every Cyrillic word with a random word of
+        the seed vocabulary, so length distributions and markup density match.
+
+        Args:
+            seed_records (list): Records in the records_clean.json shape
+            seed (int): Random seed, the same seed yields the same corpus
+        """
+        self.seed_records = seed_records
+        self.random = random.Random(seed)
+        self.vocabulary = sorted({
+            word for record in seed_records
+            for word in WORD.findall(record['content'] + ' ' + record['title'])
+        })
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_SEED_PATH, seed=0):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), seed=seed)
+
+    def _scramble(self, text):
+        return WORD.sub(lambda match: self.random.choice(self.vocabulary), text)
+
+    def generate(self, count):
+        """
+        Args:
+            count (int): Number of records
+
+        Yields:
+            dict: Synthetic record in the records_clean.json shape
+        """
+        base_time = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        for index in range(count):
+            template = self.random.choice(self.seed_records)
+            content = template['content']
+            comments = ''
+            match = COMMENT_SPAN.match(content)
+            if match:
+                comments = match.group(0).replace(match.group(1), self._scramble(match.group(1)))
+                content = content[match.end():]
+            yield {
+                'id': f'rec{index:014d}',
+                'title': self._scramble(template['title']),
+                'sequence': index + 1,
+                'attribute1': list(template['attribute1']),
+                'content': comments + self._scramble(content),
+                'last_modified': str(base_time + timedelta(minutes=index)),
+            }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _timed(function):
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    result = function()
+    return result, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def run_benchmark(records, stages=DEFAULT_STAGES, pdf_sample=200):
+    """
+    Time each pipeline stage separately on a corpus, with caches disabled.
+
+    Args:
+        records (list): Records in the records_clean.json shape
+        stages (list): Stages to run, in pipeline order (see ALL_STAGES)
+        pdf_sample (int): Records rendered to PDF; xhtml2pdf throughput is
+            extrapolated from this sample instead of rendering the whole corpus
+
+    Returns:
+        dict: Stage name to wall/CPU seconds, item count and items per second
+    """
+    from fragment import Fragment
+    from markdown_converter import MarkdownConverter
+    from pdf_generator import PDFGenerator
+    from text_fitter import TextFitter
+
+    results = {}
+
+    def record_stage(name, items, wall, cpu):
+        results[name] = {
+            'items': items,
+            'wall_seconds': round(wall, 3),
+            'cpu_seconds': round(cpu, 3),
+            'items_per_second': round(items / wall, 1) if wall else None,
+        }
+
+    records = [dict(record) for record in records]
+
+    if 'fetch' in stages:
+        from unittest.mock import patch
+        from airtable_client import AirtableClient
+        from airtable_standin import AirtableStandIn, records_from_clean_json
+        from config import Config
+
+        raw_records, raw_comments = records_from_clean_json(records)
+        with AirtableStandIn(raw_records, raw_comments) as standin, \
+                patch.multiple(Config, AIRTABLE_API_KEY='benchmark', AIRTABLE_BASE_ID='appBenchmark',
+                               AIRTABLE_TABLE_ID='tblBenchmark', AIRTABLE_ENDPOINT_URL=standin.endpoint_url,
+                               AIRTABLE_REQUESTS_PER_SECOND=0):
+            client = AirtableClient()
+            fetched, wall, cpu = _timed(lambda: list(client.iter_records()))
+        record_stage('fetch', len(fetched), wall, cpu)
+
+    records = [Fragment.from_dict(record) for record in records]
+    if 'convert' in stages or 'fit' in stages or 'render' in stages or 'pdf' in stages:
+        converter = MarkdownConverter()
+        records, wall, cpu = _timed(lambda: [converter.convert_record(record) for record in records])
+        if 'convert' in stages:
+            record_stage('convert', len(records), wall, cpu)
+
+    if 'fit' in stages:
+        fitter = TextFitter()
+        records, wall, cpu = _timed(lambda: [fitter.fit_record(record) for record in records])
+        record_stage('fit', len(records), wall, cpu)
+
+    generator = PDFGenerator()
+    if 'render' in stages:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            html_bytes, wall, cpu = _timed(lambda: generator.render_html(records, os.path.join(tmpdir, 'preview.html')))
+        record_stage('render', len(records), wall, cpu)
+        results['render']['html_bytes'] = html_bytes
+
+    if 'pdf' in stages:
+        sample = records[:pdf_sample]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, 'fragments.pdf')
+            _, wall, cpu = _timed(lambda: generator.generate_pdf(sample, output_path, incremental=False))
+        record_stage('pdf', len(sample), wall, cpu)
+        results['pdf']['pages'] = generator.stats.get('pdf_pages')
+
+    return results
+
+
+def _compare(entry, results_path):
+    """Print each stage's throughput next to the previous stored run of the same size."""
+    previous = None
+    if os.path.exists(results_path):
+        with open(results_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                candidate = json.loads(line)
+                if candidate['size'] == entry['size']:
+                    previous = candidate
+
+    print(f"\n{entry['size']} records (commit {entry['commit']})")
+    for stage, result in entry['stages'].items():
+        line = f"  {stage:<8} {result['wall_seconds']:>9.3f}s  {result['items_per_second'] or 0:>10.1f} items/s"
+        before = (previous or {}).get('stages', {}).get(stage)
+        if before and before.get('items_per_second') and result['items_per_second']:
+            change = result['items_per_second'] / before['items_per_second'] - 1
+            line += f"  ({change:+.1%} vs {previous['commit']})"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Benchmark pipeline stages on synthetic fragment corpora',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Default sizes (1k, 10k, 100k) and stages (convert, fit, render, pdf)
+  python benchmark.py
+
+  # Include the fetch stage against the local Airtable stand-in
+  python benchmark.py --sizes 1000 --stages fetch convert
+        """
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--stages', nargs='+', choices=ALL_STAGES, default=DEFAULT_STAGES)
+    parser.add_argument('--seed-file', default=DEFAULT_SEED_PATH, help='Corpus to imitate')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the synthetic corpus')
+    parser.add_argument('--pdf-sample', type=int, default=200, help='Records rendered in the pdf stage')
+    parser.add_argument('--results', default=DEFAULT_RESULTS_PATH, help='JSON lines file results are appended to')
+    args = parser.parse_args()
+
+    commit = _git_commit()
+    for size in args.sizes:
+        records = list(CorpusGenerator.from_file(args.seed_file, seed=args.seed).generate(size))
+        entry = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': commit,
+            'size': size,
+            'seed': args.seed,
+            'stages': run_benchmark(records, stages=args.stages, pdf_sample=args.pdf_sample),
+        }
+        _compare(entry, args.results)
+        os.makedirs(os.path.dirname(args.results) or '.', exist_ok=True)
+        with open(args.results, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
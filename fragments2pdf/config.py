@@ -9,6 +9,33 @@ class Config:
     AIRTABLE_API_KEY = os.getenv('AIRTABLE_API_KEY')
     AIRTABLE_BASE_ID = os.getenv('AIRTABLE_BASE_ID')
     AIRTABLE_TABLE_ID = os.getenv('AIRTABLE_TABLE_ID')
+    # Point at a local airtable_standin.py server for offline runs
+    AIRTABLE_ENDPOINT_URL = os.getenv('AIRTABLE_ENDPOINT_URL', 'https://api.airtable.com')
+
+    # Airtable allows 5 requests per second per base
+    AIRTABLE_REQUESTS_PER_SECOND = float(os.getenv('AIRTABLE_REQUESTS_PER_SECOND', 5))
+    COMMENT_WORKERS = int(os.getenv('AIRTABLE_COMMENT_WORKERS', 4))
+    # Large fragment-ID/attribute filters are split into formulas of at most this many clauses,
+    # fetched by QUERY_WORKERS threads
+    FORMULA_BATCH_SIZE = int(os.getenv('AIRTABLE_FORMULA_BATCH_SIZE', 50))
+    QUERY_WORKERS = int(os.getenv('AIRTABLE_QUERY_WORKERS', 3))
+
+    # Local incremental sync store
+    STORE_PATH = os.path.join('output', 'records.sqlite')
+    # Compact JSON Lines copy of the last fetch, replayed by --from-snapshot
+    SNAPSHOT_PATH = os.path.join('output', 'snapshot.jsonl')
+
+    # Streaming pipeline: records buffered ahead of conversion, and conversion batch size
+    PIPELINE_BUFFER = int(os.getenv('PIPELINE_BUFFER', 200))
+    PIPELINE_BATCH_SIZE = 100
+
+    # Markdown conversion cache
+    MARKDOWN_CACHE_PATH = os.path.join('output', 'markdown_cache.sqlite')
+    MARKDOWN_CACHE_MAX_ENTRIES = int(os.getenv('MARKDOWN_CACHE_MAX_ENTRIES', 5000))
+    # Full parser: 'python-markdown' or 'commonmark' (needs markdown-it-py). Plain prose with
+    # at most **bold** skips the parser unless MARKDOWN_FAST_PATH=0
+    MARKDOWN_BACKEND = os.getenv('MARKDOWN_BACKEND', 'python-markdown')
+    MARKDOWN_FAST_PATH = os.getenv('MARKDOWN_FAST_PATH', '1') != '0'
 
     # PDF Configuration
     PAGE_SIZE = (148, 210)  # A5 size in mm
@@ -38,6 +65,51 @@ class Config:
     )
     COMMENT_POSITION = (PAGE_SIZE[0] - MARGIN, MARGIN)  # Bottom-right
 
+    # Content box of fragment.html.j2: the page is A5 landscape, .content is inset
+    # 7mm left/right, 15mm from the top and 14mm from the bottom (content_frame in the PDF)
+    CONTENT_BOX_WIDTH = PAGE_SIZE[1] - 2 * 7  # mm
+    CONTENT_BOX_HEIGHT = PAGE_SIZE[0] - 15 - 14  # mm
+    CONTENT_LINE_HEIGHT = 1.1
+    FIT_MIN_FONT_SIZE = 7
+    FIT_MAX_FONT_SIZE = 11
+    FIT_CACHE_PATH = os.path.join('output', 'fit_cache.sqlite')
+    FIT_CACHE_MAX_ENTRIES = int(os.getenv('FIT_CACHE_MAX_ENTRIES', 5000))
+
+    # Records rendered per xhtml2pdf document before merging
+    PDF_CHUNK_SIZE = int(os.getenv('PDF_CHUNK_SIZE', 25))
+
+    # --watch mode: seconds between Airtable polls and local preview server port
+    WATCH_INTERVAL = float(os.getenv('WATCH_INTERVAL', 30))
+    PREVIEW_PORT = int(os.getenv('PREVIEW_PORT', 8000))
+
+    # Compiled Jinja templates, reused across runs
+    TEMPLATE_CACHE_DIR = os.path.join('output', 'template_cache')
+    # Template output pieces collected before each write while streaming HTML
+    RENDER_BUFFER_SIZE = 256
+
+    # Font files used to measure content text, first existing one wins
+    CONTENT_FONT_FILES = [
+        os.getenv('CONTENT_FONT_FILE'),
+        '~/Library/Fonts/calibril.ttf',
+        '/Library/Fonts/calibril.ttf',
+        '/Applications/Microsoft Word.app/Contents/Resources/DFonts/calibril.ttf',
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    ]
+    CONTENT_BOLD_FONT_FILES = [
+        os.getenv('CONTENT_BOLD_FONT_FILE'),
+        '~/Library/Fonts/calibrib.ttf',
+        '/Library/Fonts/calibrib.ttf',
+        '/Applications/Microsoft Word.app/Contents/Resources/DFonts/calibrib.ttf',
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+    ]
+    # PDF output draws the template's font-family with these TTFs (embedded as subsets),
+    # by default the same files the content is measured with
+    PDF_FONT_FAMILY = 'Calibri Light'
+    PDF_FONT_FILES = [os.getenv('PDF_FONT_FILE')] + CONTENT_FONT_FILES
+    PDF_BOLD_FONT_FILES = [os.getenv('PDF_BOLD_FONT_FILE')] + CONTENT_BOLD_FONT_FILES
+    # Parsed glyph widths, so measuring text does not parse the TTFs on every run
+    FONT_CACHE_DIR = os.path.join('output', 'font_cache')
+
     # Field Names (Airtable column names)
     FIELD_TITLE = 'Название'
     FIELD_SEQUENCE = 'Порядковый номер'
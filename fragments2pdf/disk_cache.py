@@ -0,0 +1,101 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+
+class DiskCache:
+    def __init__(self, path, table='entries', max_entries=5000):
+        """
+        Open (or create) a disk-backed key/value cache, e.g. of Markdown to HTML conversions.
+
+        Args:
+            path (str): Path to the SQLite cache file
+            table (str): Table holding this cache's entries, named after what is cached
+            max_entries (int): Entries kept after eviction, least recently used go first
+        """
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name {table!r}")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+
+    @staticmethod
+    def make_key(text, *salt):
+        """
+        Build a cache key from the source text and anything else that affects the output.
+
+        Args:
+            text (str): Source text, e.g. Markdown or HTML
+            *salt: Settings of whatever produced the value (extensions, versions, fonts, ...)
+
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha256()
+        for part in salt:
+            digest.update(repr(part).encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        row = self.connection.execute(f"SELECT value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.connection.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def put(self, key, value):
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, accessed) VALUES (?, ?, ?)",
+            (key, value, time.time())
+        )
+
+    def evict(self):
+        """Drop least recently used entries beyond max_entries."""
+        self.connection.execute(
+            f"DELETE FROM {self.table} WHERE key NOT IN "
+            f"(SELECT key FROM {self.table} ORDER BY accessed DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+
+    @property
+    def stats(self):
+        """Counters for the run report."""
+        return {"cache_hits": self.hits, "cache_misses": self.misses}
+
+    @property
+    def hit_ratio(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def flush(self):
+        """Evict and commit, keeping the cache open (for long-running processes)."""
+        self.evict()
+        self.connection.commit()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import threading
+from config import Config
+
+# Bump when the cached metrics format changes
+METRICS_VERSION = 1
+
+# Fonts registered with reportlab/xhtml2pdf in this process, by font name
+_registered = {}
+
+
+def find_font_file(candidates):
+    """First existing path of candidates (None entries and ~ are allowed), or None."""
+    for path in candidates:
+        if path and os.path.exists(os.path.expanduser(path)):
+            return os.path.expanduser(path)
+    return None
+
+
+def font_name(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+
+
+class FontMetrics:
+    def __init__(self, name, widths, default_width):
+        """
+        Glyph advance widths of a TrueType font, enough to measure text like reportlab does.
+
+        Args:
+            name (str): Font name
+            widths (dict): Advance width in 1/1000 em by Unicode code point
+            default_width (float): Width of characters missing from the font
+        """
+        self.name = name
+        self.widths = widths
+        self.default_width = default_width
+
+    def string_width(self, text, size):
+        """Same result as reportlab's stringWidth for the font (TrueType has no kerning there)."""
+        get = self.widths.get
+        default = self.default_width
+        return 0.001 * size * sum(get(ord(char), default) for char in text)
+
+    @classmethod
+    def load(cls, path, cache_dir=None):
+        """
+        Read the metrics of a TTF, from the on-disk cache when possible.
+
+        Parsing a TTF with reportlab takes tens of milliseconds and imports
+        reportlab; the cached JSON is keyed by path, size and mtime, so a
+        replaced font file is parsed again.
+
+        Args:
+            path (str): TTF path
+            cache_dir (str, optional): Cache directory, Config.FONT_CACHE_DIR by default
+
+        Returns:
+            FontMetrics: Metrics of the font
+        """
+        cache_dir = cache_dir or Config.FONT_CACHE_DIR
+        name = font_name(path)
+        digest = hashlib.sha1(f"{METRICS_VERSION}\0{_file_signature(path)}".encode('utf-8')).hexdigest()[:16]
+        cache_path = os.path.join(cache_dir, f"{name}-{digest}.json")
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return cls(name, {int(code): width for code, width in data["widths"].items()}, data["default_width"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        from reportlab.pdfbase.ttfonts import TTFontFile
+
+        face = TTFontFile(path)
+        metrics = cls(name, dict(face.charWidths), face.defaultWidth)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"name": name, "default_width": metrics.default_width, "widths": metrics.widths}, f)
+        os.replace(tmp_path, cache_path)
+        return metrics
+
+
+def pdf_font_files():
+    """
+    Returns:
+        tuple: Paths of the regular and bold PDF fonts (either may be None)
+    """
+    return find_font_file(Config.PDF_FONT_FILES), find_font_file(Config.PDF_BOLD_FONT_FILES)
+
+
+def pdf_font_signature():
+    """Identifies the PDF fonts in use, so rendered pages are invalidated when they change."""
+    return '\0'.join(_file_signature(path) if path else '-' for path in pdf_font_files())
+
+
+def register_pdf_fonts():
+    """
+    Register the PDF fonts with reportlab and xhtml2pdf, once per process.
+
+    The TTFs are registered under their file names as one family, and
+    Config.PDF_FONT_FAMILY (the font-family of fragment.html.j2) is mapped to
+    it in xhtml2pdf's default font table. Every xhtml2pdf document rendered
+    afterwards in this process resolves the family without parsing the font
+    again, unlike an @font-face rule, which is loaded per document. reportlab
+    embeds TrueType fonts as subsets, so each PDF only carries the glyphs it
+    uses.
+
+    Returns:
+        str: Registered regular font name, or None when no font file was found
+    """
+    regular_path, bold_path = pdf_font_files()
+    if not regular_path:
+        return None
+    regular = font_name(regular_path)
+    if regular in _registered:
+        return regular
+
+    from reportlab.lib.fonts import addMapping
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from xhtml2pdf import default
+
+    bold = font_name(bold_path) if bold_path else regular
+    for name, path in ((regular, regular_path), (bold, bold_path)):
+        if path and name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(name, path))
+    for is_bold, is_italic, name in ((0, 0, regular), (0, 1, regular), (1, 0, bold), (1, 1, bold)):
+        addMapping(regular, is_bold, is_italic, name)
+    default.DEFAULT_FONT[Config.PDF_FONT_FAMILY.lower()] = regular
+    _registered[regular] = regular_path
+    return regular
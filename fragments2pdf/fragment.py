@@ -0,0 +1,110 @@
+import hashlib
+import sys
+
+
+def fit_key(content_html):
+    """Short content hash used by the preview to remember fitted font sizes."""
+    return hashlib.sha1((content_html or '').encode('utf-8')).hexdigest()[:16]
+
+
+class Fragment:
+    """
+    One Airtable fragment as it moves through the pipeline.
+
+    Fields live in __slots__, so a record costs a fixed handful of pointers
+    instead of a dict, and attribute values are interned because a few dozen
+    distinct strings repeat across every record. Fragments also behave like the
+    dicts they replace (record['content'], 'content_html' in record, items()),
+    so stages, templates and tests can treat both the same way. Derived fields
+    (content_html, content_font_size, content_truncated) are set by later
+    stages; fit_key is computed on first use.
+    """
+
+    FIELDS = ('id', 'title', 'sequence', 'attribute1', 'content', 'last_modified')
+    DERIVED_FIELDS = ('content_html', 'content_font_size', 'content_truncated')
+    KEYS = FIELDS + DERIVED_FIELDS
+    __slots__ = KEYS + ('_fit_key',)
+
+    def __init__(self, id, title, sequence, attribute1, content, last_modified=None, **derived):
+        self.id = id
+        self.title = title
+        self.sequence = sequence
+        self.attribute1 = tuple(sys.intern(value) for value in attribute1 or ())
+        self.content = content
+        self.last_modified = last_modified
+        for key, value in derived.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Args:
+            data (dict): Record in the records_clean.json / records_processed.json shape
+
+        Returns:
+            Fragment: Fragment with the same fields
+        """
+        return cls(**data)
+
+    @property
+    def fit_key(self):
+        """Hash of content_html (see fit_key()), computed once per content."""
+        try:
+            return self._fit_key
+        except AttributeError:
+            self._fit_key = fit_key(self.get('content_html'))
+            return self._fit_key
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.KEYS:
+            raise KeyError(f"Fragment has no field {key!r}")
+        setattr(self, key, value)
+        if key == 'content_html':
+            try:
+                del self._fit_key
+            except AttributeError:
+                pass
+
+    def __contains__(self, key):
+        return key in self.KEYS and hasattr(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [key for key in self.KEYS if hasattr(self, key)]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def to_dict(self):
+        """Plain dict with the set fields, in the key order of the former dict records."""
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, Fragment):
+            return self.items() == other.items()
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Fragment(id={self.id!r}, sequence={self.sequence!r}, title={self.title!r})"
+
+
+def json_default(value):
+    """json.dumps default: Fragments as dicts, anything else (datetimes) as str."""
+    if isinstance(value, Fragment):
+        return value.to_dict()
+    return str(value)
@@ -2,11 +2,20 @@ import os
 import sys
 import argparse
 import json
-from dotenv import load_dotenv
-from airtable_client import AirtableClient
+from airtable_client import AirtableClient, read_stored_records, shared_api
 from pdf_generator import PDFGenerator
-from markdown_converter import MarkdownConverter
-from datetime import datetime
+from record_store import RecordStore
+from config import Config
+from markdown_converter import MarkdownConverter, create_worker_pool
+from disk_cache import DiskCache
+from pipeline import JsonArrayWriter, SnapshotWriter, batched, prefetch, read_snapshot, snapshot_filters, snapshot_path
+from rate_limiter import RateLimiter
+from text_fitter import TextFitter
+from run_report import RunReport
+from watcher import PreviewWatcher
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime, timezone
 from tqdm import tqdm
 
 def parse_fragment_ids(arg):
@@ -22,71 +31,359 @@ def parse_modified_since(arg):
         raise argparse.ArgumentTypeError(f"must be in ISO format (YYYY-MM-DD): {arg}")
 
 
-def process_airtable_to_pdf(fragment_ids=None, modified_since=None):
+def filter_records(records, fragment_ids=None, modified_since=None, attributes=None):
+    """
+    Apply the Airtable record filters locally, e.g. to records replayed from a snapshot.
+
+    Args:
+        records (iterable): Records to filter
+        fragment_ids (set, optional): Only keep records with these sequence IDs.
+        modified_since (datetime, optional): Only keep records modified on or after this date (naive means UTC).
+        attributes (list, optional): Only keep records tagged with one of these attributes.
+
+    Yields:
+        Records that pass every filter, in order
+    """
+    if modified_since and modified_since.tzinfo is None:
+        modified_since = modified_since.replace(tzinfo=timezone.utc)
+    for record in records:
+        if fragment_ids and record['sequence'] not in fragment_ids:
+            continue
+        if modified_since and record['last_modified'] < modified_since:
+            continue
+        if attributes and not set(record['attribute1']) & set(attributes):
+            continue
+        yield record
+
+
+def process_airtable_to_pdf(fragment_ids=None, modified_since=None, sync=False, full_sync=False, jobs=1, fit=True, pdf=False, rebuild_pdf=False, profile=False, dedupe=False, shards=False, attributes=None, query=None, local=False, from_snapshot=None, debug_json=False, output_dir=None, airtable_client=None, worker_pool=None, render_pool=None, open_browser=True):
     """
     Main function to process Airtable records and generate a PDF.
     
     Args:
         fragment_ids (set, optional): Set of fragment IDs to process. If None, process all fragments.
         modified_since (datetime, optional): If provided, only process records modified on or after this date.
+        sync (bool): Fetch only changed records into the local store and read records from it.
+        full_sync (bool): Like sync, but re-download the whole table into the store.
+        jobs (int): Number of worker processes for Markdown conversion.
+        fit (bool): Fit content font sizes server-side; otherwise the preview fits them in the browser.
+        pdf (bool): Render output/fragments.pdf instead of only the HTML preview.
+        rebuild_pdf (bool): Re-render every PDF page instead of reusing unchanged ones.
+        profile (bool): Dump cProfile stats for each stage into output/profile_<stage>.prof.
+        dedupe (bool): Emit each fragment body once in the HTML preview instead of once per attribute.
+        shards (bool): Render one document per attribute into output/shards/ with an index.json.
+        attributes (list, optional): Only process records tagged with one of these attributes.
+        query (str, optional): Full-text query selecting records from the local store's index.
+        local (bool): Read records from the local store without contacting Airtable (implied by query).
+        from_snapshot (str, optional): Replay records from this snapshot instead of contacting Airtable.
+        debug_json (bool): Also write records_clean.json and records_processed.json as pretty JSON.
+        output_dir (str, optional): Directory for outputs, caches and the local store, ./output by default.
+        airtable_client (AirtableClient, optional): Client to fetch with, e.g. one sharing a session with other targets.
+        worker_pool (ProcessPoolExecutor, optional): Markdown conversion pool shared with other targets.
+        render_pool (ProcessPoolExecutor, optional): PDF render pool shared with other targets.
+        open_browser (bool): Open the HTML preview when it is written.
     
     Returns:
         dict: Processing results including success status and output path
     """
+    output_dir = output_dir or os.path.join(os.getcwd(), "output")
+    store_path = _output_file(output_dir, Config.STORE_PATH)
+    report = RunReport(profile_dir=output_dir if profile else None)
+    # Committed and closed in the finally below, so conversions of a failed run are kept
+    caches = ExitStack()
     try:
-        # Load environment variables
-        load_dotenv()
-        
         # Initialize components
-        airtable_client = AirtableClient()
+        # Replays and selections from the local store need no Airtable credentials
+        if sync or full_sync or not (from_snapshot or local or query):
+            airtable_client = airtable_client or AirtableClient()
         pdf_generator = PDFGenerator()
-        markdown_converter = MarkdownConverter()
+        markdown_cache = caches.enter_context(DiskCache(_output_file(output_dir, Config.MARKDOWN_CACHE_PATH),
+                                                        table=MarkdownConverter.CACHE_TABLE,
+                                                        max_entries=Config.MARKDOWN_CACHE_MAX_ENTRIES))
+        markdown_converter = MarkdownConverter(cache=markdown_cache)
+        fit_cache = caches.enter_context(DiskCache(_output_file(output_dir, Config.FIT_CACHE_PATH),
+                                                   table=TextFitter.CACHE_TABLE,
+                                                   max_entries=Config.FIT_CACHE_MAX_ENTRIES))
+        text_fitter = TextFitter(cache=fit_cache)
         
-        # Fetch records from Airtable
-        records = airtable_client.get_records(modified_since=modified_since, fragment_ids=fragment_ids)
-        if not records:
-            return {
-                "success": False,
-                "error": "No records found in Airtable" + 
-                        (" for the specified date range" if modified_since else "") +
-                        (" for the specified fragment IDs" if fragment_ids else "")
-            }
-
-        # Save records as pretty JSON
-        output_dir = os.path.join(os.getcwd(), "output")
         os.makedirs(output_dir, exist_ok=True)
-        json_path = os.path.join(output_dir, "records_clean.json")
-        
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(records, f, indent=2, ensure_ascii=False, default=str)
 
-        # Process each record
+        # Fetch records from Airtable; pages stream in while earlier records are converted
+        if from_snapshot:
+            if query:
+                raise ValueError("--query selects from the local store and cannot be combined with --from-snapshot")
+            print(f"Replaying records from {from_snapshot}")
+            partial = snapshot_filters(from_snapshot)
+            if partial:
+                print(f"Warning: {from_snapshot} only holds the records of a filtered run "
+                      f"({', '.join(f'{name}={value}' for name, value in partial.items())}); "
+                      f"run without filters to snapshot the whole table")
+            records = filter_records(read_snapshot(from_snapshot), fragment_ids=fragment_ids,
+                                     modified_since=modified_since, attributes=attributes)
+        elif sync or full_sync:
+            with RecordStore(store_path) as store, report.stage("sync") as stage:
+                sync_result = airtable_client.sync(store, full=full_sync)
+                stage.update(sync_result)
+                print(f"Synced local store: {sync_result['updated']} updated, {sync_result['deleted']} deleted")
+                records = read_stored_records(store, modified_since=modified_since, fragment_ids=fragment_ids,
+                                              attributes=attributes, query=query)
+        elif local or query:
+            # Select from the local index only; the store is filled by --sync
+            with RecordStore(store_path) as store, report.stage("select") as stage:
+                if not store.record_ids():
+                    raise ValueError(f"The local record store {store_path} is empty, run with --sync first")
+                records = read_stored_records(store, modified_since=modified_since, fragment_ids=fragment_ids,
+                                              attributes=attributes, query=query)
+                stage['items'] = len(records)
+            print(f"Selected {len(records)} records from the local index")
+        else:
+            records = prefetch(
+                airtable_client.iter_records(modified_since=modified_since, fragment_ids=fragment_ids,
+                                             attributes=attributes),
+                Config.PIPELINE_BUFFER
+            )
+
+        # Snapshot records fetched from Airtable and convert them, one batch at a time. Replays
+        # and records read from the local store are not snapshotted; filtered fetches are
+        # snapshotted under a name of their own, so they never replace the full snapshot
+        fetched = not (from_snapshot or sync or full_sync or local or query)
         processed_records = []
-        for record in tqdm(records, desc="Converting Markdown to HTML"):
-            # Convert markdown content to HTML
-            record = markdown_converter.convert_record(record)
-            processed_records.append(record)
-        
-        # Save processed records as pretty JSON
-        processed_json_path = os.path.join(output_dir, "records_processed.json")
-        with open(processed_json_path, 'w', encoding='utf-8') as f:
-            json.dump(processed_records, f, indent=2, ensure_ascii=False, default=str)
+        own_worker_pool = worker_pool is None and jobs > 1
+        if own_worker_pool:
+            worker_pool = create_worker_pool(jobs)
+        try:
+            with report.stage("fetch_and_convert") as stage, ExitStack() as writers:
+                clean_writers = []
+                processed_writers = []
+                if fetched:
+                    filters = {"fragment_ids": fragment_ids, "modified_since": modified_since, "attributes": attributes}
+                    snapshot = writers.enter_context(SnapshotWriter(
+                        snapshot_path(_output_file(output_dir, Config.SNAPSHOT_PATH), filters), filters=filters
+                    ))
+                    clean_writers.append(snapshot)
+                if debug_json:
+                    clean_writers.append(writers.enter_context(
+                        JsonArrayWriter(os.path.join(output_dir, "records_clean.json"))))
+                    processed_writers.append(writers.enter_context(
+                        JsonArrayWriter(os.path.join(output_dir, "records_processed.json"))))
+                progress = tqdm(desc="Converting Markdown to HTML", unit="record")
+                for batch in batched(records, Config.PIPELINE_BATCH_SIZE):
+                    for record in batch:
+                        for writer in clean_writers:
+                            writer.write(record)
+
+                    # Convert markdown content to HTML
+                    if worker_pool:
+                        batch = markdown_converter.convert_records_parallel(batch, jobs, executor=worker_pool)
+                    else:
+                        batch = [markdown_converter.convert_record(record) for record in batch]
+
+                    # Fit content into the page box, truncating what does not fit at the minimum size
+                    if fit:
+                        batch = [text_fitter.fit_record(record) for record in batch]
+
+                    for writer in processed_writers:
+                        for record in batch:
+                            writer.write(record)
+                    processed_records.extend(batch)
+                    progress.update(len(batch))
+                progress.close()
+                if fetched and snapshot.count:
+                    print(f"Snapshot of {snapshot.count} records: {snapshot.path}")
+                stage['items'] = len(processed_records)
+                stage['worker_cpu_seconds'] = markdown_converter.stats["worker_cpu_seconds"]
+        finally:
+            if own_worker_pool:
+                worker_pool.shutdown()
+        caches.close()
+        print(f"Markdown cache: {markdown_cache.hits} hits, {markdown_cache.misses} misses "
+              f"({markdown_cache.hit_ratio:.0%} hit ratio)")
+        if fit:
+            print(f"Fit cache: {fit_cache.hits} hits, {fit_cache.misses} misses ({fit_cache.hit_ratio:.0%} hit ratio)")
+        if airtable_client:
+            report.add("airtable", airtable_client.stats)
+        report.add("markdown", {**markdown_converter.stats, **markdown_cache.stats})
+        report.add("fit", {**text_fitter.stats, **fit_cache.stats})
+
+        if not processed_records:
+            return _finish(report, output_dir, {
+                "success": False,
+                "error": "No records found in Airtable" + 
+                        (" for the specified date range" if modified_since else "") +
+                        (" for the specified fragment IDs" if fragment_ids else "") +
+                        (" for the specified attributes" if attributes else "") +
+                        (" for the specified query" if query else "")
+            })
 
         # Generate PDF
-        output_path = os.path.join(os.getcwd(), "output/fragments.pdf")
-        pdf_generator.generate_pdf(processed_records, output_path)
+        output_path = os.path.join(output_dir, "fragments.pdf")
+        with report.stage("render") as stage:
+            if shards:
+                output_path = pdf_generator.generate_shards(processed_records, os.path.join(output_dir, "shards"),
+                                                            pdf=pdf, jobs=jobs, incremental=not rebuild_pdf,
+                                                            executor=render_pool)
+                success = output_path is not None
+            elif pdf:
+                success = pdf_generator.generate_pdf(processed_records, output_path, jobs=jobs,
+                                                     incremental=not rebuild_pdf, executor=render_pool)
+            else:
+                output_path = pdf_generator.generate_preview(processed_records, output_path, open_browser=open_browser,
+                                                             dedupe=dedupe)
+                success = output_path is not None
+            stage['items'] = len(processed_records)
+            stage['worker_cpu_seconds'] = pdf_generator.stats.get("worker_cpu_seconds", 0.0)
+        report.add("pdf", pdf_generator.stats)
+        if not success:
+            return _finish(report, output_dir, {"success": False, "error": "PDF generation failed" if pdf else "Preview generation failed"})
         
-        return {
+        return _finish(report, output_dir, {
             "success": True,
             "output_path": output_path,
             "record_count": len(processed_records)
-        }
+        })
         
     except Exception as e:
-        return {
+        return _finish(report, output_dir, {
             "success": False,
             "error": str(e)
-        }
+        })
+    finally:
+        caches.close()
+
+
+def watch_preview(fragment_ids=None, attributes=None, fit=True, dedupe=False, interval=None, port=None):
+    """
+    Serve a live preview that is re-rendered whenever fragments change in Airtable.
+
+    Args:
+        fragment_ids (set, optional): Only watch these sequence IDs.
+        attributes (list, optional): Only watch records tagged with one of these attributes.
+        fit (bool): Fit content font sizes server-side.
+        dedupe (bool): Emit each fragment body once in the preview.
+        interval (float, optional): Seconds between polls, defaults to Config.WATCH_INTERVAL.
+        port (int, optional): Preview server port, defaults to Config.PREVIEW_PORT.
+    """
+    output_dir = os.path.join(os.getcwd(), "output")
+    os.makedirs(output_dir, exist_ok=True)
+    with DiskCache(Config.MARKDOWN_CACHE_PATH, table=MarkdownConverter.CACHE_TABLE,
+                   max_entries=Config.MARKDOWN_CACHE_MAX_ENTRIES) as markdown_cache, \
+            DiskCache(Config.FIT_CACHE_PATH, table=TextFitter.CACHE_TABLE,
+                      max_entries=Config.FIT_CACHE_MAX_ENTRIES) as fit_cache:
+        watcher = PreviewWatcher(
+            AirtableClient(), MarkdownConverter(cache=markdown_cache), PDFGenerator(), output_dir,
+            text_fitter=TextFitter(cache=fit_cache) if fit else None,
+            fragment_ids=fragment_ids, attributes=attributes, dedupe=dedupe
+        )
+        watcher.run(interval or Config.WATCH_INTERVAL, port=port or Config.PREVIEW_PORT)
+
+
+# Per-target options a batch manifest may set, passed on to process_airtable_to_pdf;
+# the command-line flags of the same name are the defaults for every target
+MANIFEST_OPTIONS = {'fragment_ids', 'modified_since', 'attributes', 'query', 'local', 'sync', 'full_sync', 'pdf',
+                    'rebuild_pdf', 'dedupe', 'shards', 'fit', 'debug_json'}
+# Flags that do not apply to a batch run
+MANIFEST_CONFLICTS = {'from_snapshot': '--from-snapshot', 'profile': '--profile', 'watch': '--watch',
+                      'count': '--count'}
+
+
+def load_manifest(path):
+    """
+    Read a batch manifest listing several base/table targets.
+
+    The manifest is JSON of the form
+    {"targets": [{"name": "review-2025", "base_id": "app...", "table_id": "tbl...", "pdf": true}, ...]}.
+    Each target may also set output_dir (output/<name> by default) and any of
+    MANIFEST_OPTIONS; fragment_ids is a list and modified_since an ISO date.
+
+    Args:
+        path (str): Manifest path
+
+    Returns:
+        list: Target dicts with output_dir filled in and options parsed
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f).get('targets') or []
+    if not entries:
+        raise ValueError(f"Manifest {path} lists no targets")
+
+    targets = []
+    for number, entry in enumerate(entries, 1):
+        missing = [key for key in ('name', 'base_id', 'table_id') if not entry.get(key)]
+        if missing:
+            raise ValueError(f"Manifest target {number} is missing {', '.join(missing)}")
+        unknown = set(entry) - {'name', 'base_id', 'table_id', 'output_dir'} - MANIFEST_OPTIONS
+        if unknown:
+            raise ValueError(f"Manifest target {entry['name']!r} has unknown options: {', '.join(sorted(unknown))}")
+        target = dict(entry)
+        target['output_dir'] = os.path.abspath(target.get('output_dir') or os.path.join('output', target['name']))
+        if target.get('fragment_ids'):
+            target['fragment_ids'] = set(target['fragment_ids'])
+        if target.get('modified_since'):
+            target['modified_since'] = datetime.fromisoformat(target['modified_since'])
+        targets.append(target)
+
+    output_dirs = [target['output_dir'] for target in targets]
+    if len(set(output_dirs)) != len(output_dirs):
+        raise ValueError(f"Manifest {path} has several targets writing to the same output_dir")
+    return targets
+
+
+def run_batch(targets, jobs=1, **defaults):
+    """
+    Process several base/table targets concurrently in one invocation.
+
+    Each target runs in its own thread, so the network-bound fetches overlap
+    and the batch takes about as long as its slowest target. The targets
+    share one pooled HTTP session and one rate limiter per base (Airtable's
+    limit is per base), plus one Markdown conversion pool and one PDF render
+    pool with `jobs` worker processes each.
+
+    Args:
+        targets (list): Targets from load_manifest
+        jobs (int): Worker processes of the shared conversion and render pools
+        **defaults: process_airtable_to_pdf options for targets that do not set them
+
+    Returns:
+        list: process_airtable_to_pdf results with the target name added, in manifest order
+    """
+    api = shared_api(connections=len(targets) * max(Config.COMMENT_WORKERS, Config.QUERY_WORKERS, 1))
+    limiters = {}
+    worker_pool = create_worker_pool(jobs) if jobs > 1 else None
+    # xhtml2pdf is not thread-safe, so PDFs are rendered in worker processes even with jobs=1
+    render_pool = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            futures = []
+            for target in targets:
+                if target['base_id'] not in limiters:
+                    limiters[target['base_id']] = RateLimiter(Config.AIRTABLE_REQUESTS_PER_SECOND)
+                client = AirtableClient(target['base_id'], target['table_id'], api=api,
+                                        rate_limiter=limiters[target['base_id']])
+                options = {**defaults, **{key: value for key, value in target.items() if key in MANIFEST_OPTIONS}}
+                futures.append(executor.submit(
+                    process_airtable_to_pdf, jobs=jobs, output_dir=target['output_dir'], airtable_client=client,
+                    worker_pool=worker_pool, render_pool=render_pool, open_browser=False, **options
+                ))
+            return [dict(future.result(), name=target['name']) for target, future in zip(targets, futures)]
+    finally:
+        if worker_pool:
+            worker_pool.shutdown()
+        render_pool.shutdown()
+
+
+def _output_file(output_dir, config_path):
+    """Place a per-run file configured under output/ (store, caches, snapshot) in output_dir instead."""
+    return os.path.join(output_dir, os.path.basename(config_path))
+
+
+def _finish(report, output_dir, result):
+    """Write output/run_report.json for this run and pass the result through."""
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        report.write(os.path.join(output_dir, "run_report.json"), **result)
+    except OSError as e:
+        print(f"Could not write run report: {e}")
+    return result
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -103,8 +400,35 @@ Examples:
   # Process specific fragments
   python main.py --fragment-ids 123 456 789
 
+  # Process fragments of two report sections
+  python main.py --attributes "Детство" "Работа"
+
   # Process specific fragments modified after a date
   python main.py --fragment-ids 123 456 789 --modified-since 2024-03-01
+
+  # Render the PDF in parallel chunks on 4 cores
+  python main.py --pdf --jobs 4
+
+  # One PDF per attribute section, 4 at a time, listed in output/shards/index.json
+  python main.py --pdf --shards --jobs 4
+
+  # Serve a preview at http://127.0.0.1:8000 that reloads when fragments change
+  python main.py --watch --interval 15
+
+  # Download only changed records into output/records.sqlite and render all of them
+  python main.py --sync
+
+  # Iterate on the template offline, re-rendering the records fetched by the last run
+  python main.py --from-snapshot
+
+  # Render every base/table listed in a manifest concurrently, sharing connections and workers
+  python main.py --manifest reviews.json --pdf --jobs 4
+
+  # Booklet from the local index, no Airtable requests: fragments mentioning creativity in one section
+  python main.py --query "креатив*" --attributes "Работа"
+
+  # The same section from the local store, e.g. on a train
+  python main.py --local --attributes "Работа"
         """
     )
     
@@ -120,9 +444,159 @@ Examples:
         help='Process only records modified on or after this date (YYYY-MM-DD format)'
     )
     
+    parser.add_argument(
+        '--attributes',
+        nargs='+',
+        help='Process only records tagged with one of these attribute values'
+    )
+
+    parser.add_argument(
+        '--query',
+        help='Select records from the local index (filled by --sync) with a full-text query over title, '
+             'content, comments and attributes, e.g. "креатив*" or "title:детство"; no Airtable requests'
+    )
+
+    parser.add_argument(
+        '--local',
+        action='store_true',
+        help='Select records from the local store (filled by --sync) instead of fetching them; '
+             'no Airtable requests (implied by --query)'
+    )
+
+    parser.add_argument(
+        '--manifest',
+        metavar='PATH',
+        help='Process every base/table target listed in this JSON manifest concurrently; filters and '
+             'output flags apply to targets that do not set them'
+    )
+
+    parser.add_argument(
+        '--from-snapshot',
+        nargs='?',
+        const=Config.SNAPSHOT_PATH,
+        metavar='PATH',
+        help=f'Re-render records from a snapshot written by an earlier run instead of fetching them '
+             f'(default: {Config.SNAPSHOT_PATH})'
+    )
+
+    parser.add_argument(
+        '--debug-json',
+        action='store_true',
+        help='Also write output/records_clean.json and output/records_processed.json as pretty JSON'
+    )
+
+    parser.add_argument(
+        '--sync',
+        action='store_true',
+        help='Incrementally sync the local record store and render from it'
+    )
+
+    parser.add_argument(
+        '--full-sync',
+        action='store_true',
+        help='Re-download the whole table into the local record store and render from it'
+    )
+    
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='Number of worker processes for Markdown conversion and PDF rendering (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--pdf',
+        action='store_true',
+        help='Render output/fragments.pdf (in parallel chunks with --jobs) instead of only the HTML preview'
+    )
+
+    parser.add_argument(
+        '--rebuild-pdf',
+        action='store_true',
+        help='With --pdf, re-render all pages instead of reusing unchanged pages of the previous PDF'
+    )
+
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Dump cProfile stats for each stage, including the threads it starts, into output/profile_<stage>.prof'
+    )
+
+    parser.add_argument(
+        '--no-fit',
+        dest='fit',
+        action='store_false',
+        help='Skip server-side text fitting and let the HTML preview fit pages in the browser'
+    )
+
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running: poll Airtable for changes and serve an auto-reloading preview'
+    )
+
+    parser.add_argument(
+        '--interval',
+        type=float,
+        help='With --watch, seconds between Airtable polls (default: WATCH_INTERVAL or 30)'
+    )
+
+    parser.add_argument(
+        '--port',
+        type=int,
+        help='With --watch, port of the local preview server (default: PREVIEW_PORT or 8000)'
+    )
+
+    parser.add_argument(
+        '--count',
+        action='store_true',
+        help='Only print how many records match the filters (fetches record IDs, no content)'
+    )
+
+    parser.add_argument(
+        '--shards',
+        action='store_true',
+        help='Render one HTML (or, with --pdf, PDF) document per attribute into output/shards/ in parallel'
+    )
+
+    parser.add_argument(
+        '--dedupe',
+        action='store_true',
+        help='Emit each fragment body once in preview.html; other attribute pages copy it on load'
+    )
+    
     args = parser.parse_args()
+
+    if args.manifest:
+        conflicts = [flag for name, flag in MANIFEST_CONFLICTS.items() if getattr(args, name)]
+        if conflicts:
+            parser.error(f"{', '.join(conflicts)} cannot be combined with --manifest")
+        results = run_batch(load_manifest(args.manifest), jobs=args.jobs,
+                            **{name: getattr(args, name) for name in MANIFEST_OPTIONS})
+        for result in results:
+            if result["success"]:
+                print(f"{result['name']}: {result['record_count']} records -> {result['output_path']}")
+            else:
+                print(f"{result['name']}: Error: {result['error']}")
+        sys.exit(0 if all(result["success"] for result in results) else 1)
+
+    if args.count:
+        count = AirtableClient().get_record_count(modified_since=args.modified_since, fragment_ids=args.fragment_ids,
+                                                 attributes=args.attributes)
+        print(f"{count} records match")
+        sys.exit(0)
+
+    if args.watch:
+        watch_preview(args.fragment_ids, args.attributes, fit=args.fit, dedupe=args.dedupe,
+                      interval=args.interval, port=args.port)
+        sys.exit(0)
     
-    result = process_airtable_to_pdf(args.fragment_ids, args.modified_since)
+    result = process_airtable_to_pdf(args.fragment_ids, args.modified_since, sync=args.sync, full_sync=args.full_sync,
+                                     jobs=args.jobs, fit=args.fit, pdf=args.pdf,
+                                     rebuild_pdf=args.rebuild_pdf, profile=args.profile, dedupe=args.dedupe,
+                                     shards=args.shards, attributes=args.attributes,
+                                     query=args.query, local=args.local, from_snapshot=args.from_snapshot,
+                                     debug_json=args.debug_json)
     
     if result["success"]:
         print(f"Successfully generated PDF with {result['record_count']} records")
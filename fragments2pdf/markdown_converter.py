@@ -1,11 +1,148 @@
-import markdown
-# from markdown.extensions import fenced_code, tables, nl2br, sane_lists
-from markdown.extensions import nl2br
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from config import Config
+
+# Per-process converter used by convert_records_parallel workers
+_worker_converter = None
+
+# Plain-text fast path: anything that could start Markdown syntax other than **bold**
+# (HTML, entities, escapes, code, links, underscores, headings, tabs) sends the text to the backend
+_SYNTAX_CHARS = re.compile(r'[<>&\\`\[\]_#\t\x02\x03]')
+# Lines that start a list or are a setext underline / horizontal rule
+_BLOCK_LINE = re.compile(r'^(?:[-+*] |\d+\. |[-= ]+$)')
+_STRONG = re.compile(r'\*\*([^*]+?)\*\*')
+# Asterisks Python-Markdown leaves as text (surrounded by whitespace) or reads as strong+em
+_LITERAL_ASTERISKS = re.compile(r'(?:^|(?<=\s))\*{1,3}(?=\s|$)|\*{3}')
+
+
+def _convert_plain(text):
+    """
+    Convert prose with no Markdown syntax beyond **bold** and --- rules in one linear pass.
+
+    Produces exactly what Python-Markdown with nl2br produces for such text:
+    blank-line separated paragraphs, <br /> line breaks, <strong> and <hr />.
+
+    Args:
+        text (str): Preprocessed markdown text
+
+    Returns:
+        str: HTML, or None if the text needs the full parser
+    """
+    if _SYNTAX_CHARS.search(text):
+        return None
+    blocks = []
+    lines = []
+    previous = ''
+    for line in text.split('\n'):
+        # Indented code, hard breaks and whitespace-only lines are left to the parser
+        if line != line.strip():
+            return None
+        if not line:
+            if lines:
+                blocks.append(lines)
+                lines = []
+        elif line == '---':
+            # Directly under text or another rule, --- underlines a heading
+            if previous:
+                return None
+            blocks.append(None)
+        elif _BLOCK_LINE.match(line):
+            return None
+        else:
+            lines.append(line)
+        previous = line
+    if lines:
+        blocks.append(lines)
+
+    html = []
+    for block in blocks:
+        if block is None:
+            html.append('<hr />')
+            continue
+        body = '\n'.join(block)
+        if _LITERAL_ASTERISKS.search(body):
+            return None
+        body = _STRONG.sub(r'<strong>\1</strong>', body)
+        # Single-asterisk emphasis has too many corner cases to mirror here
+        if '*' in body:
+            return None
+        html.append('<p>' + body.replace('\n', '<br />\n') + '</p>')
+    return '\n'.join(html)
+
+
+def _init_worker(backend=None):
+    global _worker_converter
+    _worker_converter = MarkdownConverter(backend=backend)
+
+
+def _convert_in_worker(text):
+    """Convert in a worker process; returns the HTML and the CPU seconds the worker spent on it."""
+    start = time.process_time()
+    html = _worker_converter.convert(text)
+    return html, time.process_time() - start
+
+
+def create_worker_pool(jobs, backend=None):
+    """
+    Create a process pool whose workers each hold one MarkdownConverter.
+
+    Args:
+        jobs (int): Number of worker processes
+        backend (str, optional): Full-parse backend of the workers, Config.MARKDOWN_BACKEND by default
+
+    Returns:
+        ProcessPoolExecutor: Pool to pass to MarkdownConverter.convert_records_parallel
+    """
+    return ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(backend,))
+
 
 class MarkdownConverter:
-    def __init__(self):
-        """Initialize the markdown converter with custom extensions."""
-        self.md = markdown.Markdown(extensions=['nl2br'])
+    # Bump when the preprocessing in convert() changes, so cached HTML is invalidated
+    PREPROCESS_VERSION = 2
+
+    BACKENDS = ('python-markdown', 'commonmark')
+
+    # Table of the DiskCache holding conversions
+    CACHE_TABLE = 'markdown_html'
+
+    def __init__(self, cache=None, backend=None, fast_path=None):
+        """
+        Initialize the markdown converter with custom extensions.
+
+        Args:
+            cache (DiskCache, optional): Persistent cache used by convert_record
+            backend (str, optional): Full parser, 'python-markdown' or 'commonmark'
+                (markdown-it-py); Config.MARKDOWN_BACKEND by default
+            fast_path (bool, optional): Convert plain prose without the full parser;
+                Config.MARKDOWN_FAST_PATH by default
+        """
+        self.backend = backend or Config.MARKDOWN_BACKEND
+        self.extensions = ['nl2br']
+        # Backends are imported here so that importing this module stays cheap
+        if self.backend == 'python-markdown':
+            import markdown
+
+            self.md = markdown.Markdown(extensions=self.extensions)
+            self.markdown_version = markdown.__version__
+        elif self.backend == 'commonmark':
+            try:
+                import markdown_it
+            except ImportError:
+                raise ImportError("MARKDOWN_BACKEND=commonmark requires markdown-it-py "
+                                  "(pip install markdown-it-py)") from None
+
+            # breaks=True is CommonMark's counterpart of nl2br
+            self.md = markdown_it.MarkdownIt('commonmark', {'breaks': True, 'html': True})
+            self.markdown_version = markdown_it.__version__
+        else:
+            raise ValueError(f"Unknown markdown backend {self.backend!r}, expected one of {self.BACKENDS}")
+        # The fast path reproduces Python-Markdown's output, so other backends always do a full parse
+        if fast_path is None:
+            fast_path = Config.MARKDOWN_FAST_PATH
+        self.fast_path = fast_path and self.backend == 'python-markdown'
+        self.cache = cache
+        self.stats = {"conversions": 0, "fast_conversions": 0, "convert_seconds": 0.0, "worker_cpu_seconds": 0.0}
         """
             extensions=[
                 'fenced_code',  # For code blocks
@@ -41,13 +178,32 @@ class MarkdownConverter:
         if not text:
             return ""
         
-        text = text.replace('----', '---\n')
+        start = time.perf_counter()
+        text = self._preprocess(text)
+        html = _convert_plain(text) if self.fast_path else None
+        if html is not None:
+            self.stats["fast_conversions"] += 1
+        else:
+            html = self._convert_full(text)
+        self.stats["conversions"] += 1
+        self.stats["convert_seconds"] += time.perf_counter() - start
+        
+        return html
+
+    @staticmethod
+    def _preprocess(text):
+        # Both backends read \r\n and lone \r as line breaks; the fast path only knows \n
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        return text.replace('----', '---\n')
+
+    def _convert_full(self, text):
+        if self.backend == 'commonmark':
+            return self.md.render(text).rstrip('\n')
         # Convert markdown to HTML
         html = self.md.convert(text)
-        
+
         # Reset the converter for next use
         self.md.reset()
-        
         return html
 
     def convert_record(self, record: dict) -> dict:
@@ -55,11 +211,96 @@ class MarkdownConverter:
         Convert markdown content in a record to HTML.
         
         Args:
-            record (dict): Record containing markdown content
+            record (Fragment or dict): Record containing markdown content
             
         Returns:
             dict: Record with HTML content
         """
         if 'content' in record:
-            record['content_html'] = self.convert(record['content'])
-        return record 
\ No newline at end of file
+            record['content_html'] = self.convert_cached(record['content'])
+        return record
+
+    def _cache_key(self, text):
+        return self.cache.make_key(text, self.backend, self.markdown_version, self.extensions,
+                                   self.PREPROCESS_VERSION)
+
+    def convert_cached(self, text: str) -> str:
+        """
+        Convert markdown text to HTML, reusing the persistent cache when one is configured.
+
+        Args:
+            text (str): Markdown text to convert
+
+        Returns:
+            str: Converted HTML
+        """
+        if self.cache is None or not text:
+            return self.convert(text)
+
+        key = self._cache_key(text)
+        html = self.cache.get(key)
+        if html is None:
+            html = self.convert(text)
+            self.cache.put(key, html)
+        return html 
+
+    def convert_records_parallel(self, records: list, jobs: int, executor=None) -> list:
+        """
+        Convert markdown content of many records using a pool of worker processes.
+
+        Cached conversions are resolved in this process; only misses are sent to
+        the workers, each of which builds its own converter once. Output order
+        and HTML are identical to calling convert_record on each record.
+
+        Args:
+            records (list): Records containing markdown content
+            jobs (int): Number of worker processes
+            executor (ProcessPoolExecutor, optional): Pool from create_worker_pool to reuse
+                across calls; a temporary one is created otherwise
+
+        Returns:
+            list: Records with HTML content, in input order
+        """
+        pending = []
+        for record in records:
+            if 'content' not in record:
+                continue
+            text = record['content']
+            key = None
+            if self.cache is not None and text:
+                key = self._cache_key(text)
+                html = self.cache.get(key)
+                if html is not None:
+                    record['content_html'] = html
+                    continue
+            # Plain prose is cheaper to convert here than to pickle to a worker
+            html = _convert_plain(self._preprocess(text)) if self.fast_path and text else None
+            if html is not None:
+                self.stats["conversions"] += 1
+                self.stats["fast_conversions"] += 1
+                record['content_html'] = html
+                if key is not None:
+                    self.cache.put(key, html)
+                continue
+            pending.append((record, key))
+
+        if pending:
+            # Large chunks amortise pickling; four per worker keeps the pool balanced
+            chunksize = max(1, len(pending) // (jobs * 4))
+            pool = executor or create_worker_pool(jobs, self.backend)
+            start = time.perf_counter()
+            try:
+                results = pool.map(_convert_in_worker, [record['content'] for record, _ in pending],
+                                   chunksize=chunksize)
+                for (record, key), (html, cpu_seconds) in zip(pending, results):
+                    record['content_html'] = html
+                    self.stats["worker_cpu_seconds"] += cpu_seconds
+                    if key is not None:
+                        self.cache.put(key, html)
+            finally:
+                if executor is None:
+                    pool.shutdown()
+            self.stats["conversions"] += len(pending)
+            self.stats["convert_seconds"] += time.perf_counter() - start
+
+        return records
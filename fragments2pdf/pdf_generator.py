@@ -1,48 +1,404 @@
+import hashlib
+import json
 import os
-from jinja2 import Environment, FileSystemLoader
-from xhtml2pdf import pisa
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 from config import Config
+from fonts import pdf_font_signature, register_pdf_fonts
+from fragment import fit_key, json_default
 
 class PDFGenerator:
     def __init__(self):
-        """Initialize the PDF generator with template environment."""
-        self.env = Environment(loader=FileSystemLoader('.'))
+        """
+        Initialize the PDF generator with template environment.
+
+        Compiled templates are cached in Config.TEMPLATE_CACHE_DIR, so warm starts
+        skip parsing and compiling fragment.html.j2 (the cache is keyed by the
+        template source, so edits are picked up).
+        """
+        from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+        os.makedirs(Config.TEMPLATE_CACHE_DIR, exist_ok=True)
+        self.env = Environment(
+            loader=FileSystemLoader('.'),
+            bytecode_cache=FileSystemBytecodeCache(Config.TEMPLATE_CACHE_DIR),
+        )
+        self.env.filters['fit_key'] = fit_key
         self.template = self.env.get_template('fragment.html.j2')
+        # Lets the preview tell sizes it fitted under an older template from current ones
+        template_source = self.env.loader.get_source(self.env, self.template.name)[0]
+        self.env.globals['template_version'] = hashlib.sha1(template_source.encode('utf-8')).hexdigest()[:12]
+        self.stats = {}
+
+    def render_html(self, records, path, **context):
+        """
+        Stream the rendered template to a file without building the whole document in memory.
+
+        The document is streamed into a temporary file that replaces path once it is
+        complete, so a reader of path (e.g. the --watch preview server) never sees a
+        half-written page, and a failed render leaves the previous one in place.
+
+        Args:
+            records (list): Records to render
+            path (str): Output HTML path
+            **context: Extra template variables
+
+        Returns:
+            int: Size of the written file in bytes
+        """
+        stream = self.template.stream(records=records, **context)
+        stream.enable_buffering(Config.RENDER_BUFFER_SIZE)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                stream.dump(f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return os.path.getsize(path)
+
+    def generate_preview(self, records, output_path, open_browser=True, **context):
+        """
+        Render records to an HTML preview and open it in the browser.
+
+        Args:
+            records (list): List of records to include in the preview
+            output_path (str): Path of the PDF; preview.html is written next to it
+            open_browser (bool): Open the preview with the system `open` command
+            **context: Template options, e.g. dedupe=True to emit each fragment
+                body once (its other attribute pages reference it and are filled
+                in by the page script on load) or live_reload=True
+
+        Returns:
+            str: Path of the HTML preview, or None on error
+        """
+        try:
+            # Render template with records straight into the preview file
+            html_debug_path = os.path.join(os.path.dirname(output_path), 'preview.html')
+            start = time.perf_counter()
+            html_bytes = self.render_html(records, html_debug_path, **context)
+            self.stats = {"render_seconds": round(time.perf_counter() - start, 3), "html_bytes": html_bytes}
 
-    def generate_pdf(self, records, output_path):
+            # Open the HTML file in the default browser for preview on macOS
+            if open_browser:
+                os.system(f'open {html_debug_path}')
+
+            return html_debug_path
+
+        except Exception as e:
+            print(f"Error generating preview: {e}")
+            return None
+
+    def _page_units(self, records, section=None):
+        """
+        Split records into page units, one per (record, attribute) page of the template.
+
+        Args:
+            records (list): Records to split
+            section (str, optional): Only keep pages for this attribute value
+
+        Returns:
+            list: dicts with record, attr_index, key and content/template hash
+        """
+        template_source = self.env.loader.get_source(self.env, self.template.name)[0]
+        # Pages are re-rendered when the template or the embedded fonts change
+        template_hash = hashlib.sha1(f"{template_source}\0{pdf_font_signature()}".encode('utf-8')).hexdigest()
+        units = []
+        for record in records:
+            inputs = json.dumps(
+                {key: value for key, value in record.items() if key != 'content'},
+                sort_keys=True, ensure_ascii=False, default=str
+            )
+            for attr_index, attr in enumerate(record.get('attribute1') or []):
+                if section is not None and attr != section:
+                    continue
+                digest = hashlib.sha1(f"{template_hash}\0{attr_index}\0{inputs}".encode('utf-8')).hexdigest()
+                units.append({
+                    "record": record,
+                    "attr_index": attr_index,
+                    "key": f"{record.get('id')}:{attr_index}",
+                    "hash": digest,
+                })
+        return units
+
+    def generate_pdf(self, records, output_path, jobs=1, chunk_size=None, incremental=True, section=None,
+                     executor=None):
         """
         Generate PDF from records using the template.
+
+        Page units (a record shown under one of its attributes) that need rendering
+        are grouped into chunks of chunk_size, and each chunk is rendered as one
+        xhtml2pdf document, in parallel worker processes when jobs > 1, so its pages
+        share one embedded subset of each font. The pages are merged in order into
+        output_path. A manifest next to the PDF maps each unit to its page range and
+        input hash, so with incremental=True only units whose inputs changed are
+        re-rendered; the rest are copied from the previous PDF.
         
         Args:
             records (list): List of records to include in the PDF
             output_path (str): Path where to save the PDF
+            jobs (int): Number of worker processes rendering chunks
+            chunk_size (int, optional): Page units per worker task, defaults to Config.PDF_CHUNK_SIZE
+            incremental (bool): Reuse unchanged pages of the previous PDF
+            section (str, optional): Only render pages for this attribute value
+            executor (ProcessPoolExecutor, optional): Pool to render chunks in, shared with
+                other documents; a temporary one with `jobs` workers is created otherwise
             
         Returns:
             bool: True if PDF was generated successfully
         """
-        try:
-            # Render template with records
-            html = self.template.render(records=records)
-            # Save HTML to file for debugging
-            html_debug_path = os.path.join(os.path.dirname(output_path), 'preview.html')
-            with open(html_debug_path, 'w', encoding='utf-8') as f:
-                f.write(html)
+        chunk_size = chunk_size or Config.PDF_CHUNK_SIZE
+        manifest_path = os.path.splitext(output_path)[0] + '.manifest.json'
+        self.chunk_timings = []
 
-            # Open the HTML file in the default browser for preview on macOS
-            os.system(f'open {html_debug_path}')
-        
-            return None
+        try:
+            units = self._page_units(records, section=section)
+            previous = _load_manifest(manifest_path, output_path) if incremental else {}
+            to_render = [unit for unit in units if previous.get(unit["key"], {}).get("hash") != unit["hash"]]
+            self.last_build = {"rendered": len(to_render), "reused": len(units) - len(to_render)}
+            print(f"PDF pages: {self.last_build['rendered']} to render, {self.last_build['reused']} reused")
 
-            # Convert HTML to PDF
-            with open(output_path, 'wb') as output_file:
-                pisa_status = pisa.CreatePDF(
-                    html,
-                    dest=output_file,
-                    encoding='utf-8'
+            output_dir = os.path.dirname(output_path) or '.'
+            with tempfile.TemporaryDirectory(dir=output_dir) as tmpdir:
+                chunks = [to_render[i:i + chunk_size] for i in range(0, len(to_render), chunk_size)]
+                tasks = (
+                    (self.template.render(records=[unit["record"] for unit in chunk],
+                                          only_attrs=[unit["attr_index"] for unit in chunk], pdf=True),
+                     os.path.join(tmpdir, f'chunk_{index:06d}.pdf'), len(chunk))
+                    for index, chunk in enumerate(chunks)
                 )
-            
-            return pisa_status.err == 0
-            
+
+                in_workers = executor is not None or (jobs > 1 and len(chunks) > 1)
+                if executor is not None:
+                    futures = [executor.submit(_render_pdf_chunk, *task) for task in tasks]
+                    results = [future.result() for future in futures]
+                elif in_workers:
+                    with ProcessPoolExecutor(max_workers=jobs) as pool:
+                        futures = [pool.submit(_render_pdf_chunk, *task) for task in tasks]
+                        results = [future.result() for future in futures]
+                else:
+                    results = [_render_pdf_chunk(*task) for task in tasks]
+
+                for index, (chunk, (path, ranges, duration, cpu_seconds)) in enumerate(zip(chunks, results)):
+                    for unit, (start, pages) in zip(chunk, ranges):
+                        unit["path"], unit["start"], unit["pages"] = path, start, pages
+                    self.chunk_timings.append({"chunk": index, "pages": len(chunk), "seconds": duration,
+                                               "cpu_seconds": round(cpu_seconds, 3)})
+                    print(f"PDF chunk {index + 1}/{len(chunks)}: {len(chunk)} pages in {duration:.2f}s")
+
+                manifest = _splice_pdf(units, previous, output_path, os.path.join(tmpdir, 'merged.pdf'))
+                os.replace(os.path.join(tmpdir, 'merged.pdf'), output_path)
+
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+            self.stats = {
+                "pages_rendered": self.last_build["rendered"],
+                "pages_reused": self.last_build["reused"],
+                "pdf_pages": sum(unit["pages"] for unit in manifest["units"]),
+                "chunks": self.chunk_timings,
+                # CPU of other processes; chunks rendered here count towards this process
+                "worker_cpu_seconds": round(sum(t["cpu_seconds"] for t in self.chunk_timings), 3) if in_workers else 0.0,
+            }
+            return True
+
         except Exception as e:
             print(f"Error generating PDF: {e}")
             return False
+
+    def generate_shards(self, records, output_dir, pdf=False, jobs=1, incremental=True, executor=None):
+        """
+        Render one document per attribute value (report section), in parallel.
+
+        Each shard holds the pages of the records tagged with its attribute, in
+        record order. Shards whose records and template are unchanged since the
+        last run are kept as they are. index.json in output_dir lists every
+        shard with its file, record count and page count.
+
+        Args:
+            records (list): Processed records, sorted by attribute
+            output_dir (str): Directory for the shards and index.json
+            pdf (bool): Render PDF shards instead of HTML
+            jobs (int): Number of shards rendered concurrently
+            incremental (bool): Reuse unchanged shards (and unchanged PDF pages)
+            executor (ProcessPoolExecutor, optional): Pool to render shards in, shared with
+                other documents; a temporary one with `jobs` workers is created otherwise
+
+        Returns:
+            str: Path of index.json, or None on error
+        """
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            index_path = os.path.join(output_dir, 'index.json')
+            previous = {}
+            if incremental and os.path.exists(index_path):
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    previous = {shard["section"]: shard for shard in json.load(f)["shards"]}
+
+            sections = {}
+            for record in records:
+                for attr in record.get('attribute1') or []:
+                    sections.setdefault(attr, []).append(record)
+
+            template_source = self.env.loader.get_source(self.env, self.template.name)[0]
+            extension = '.pdf' if pdf else '.html'
+            shards, tasks = [], []
+            for number, (section, section_records) in enumerate(sections.items(), 1):
+                digest = hashlib.sha1(json.dumps(
+                    [template_source, pdf and pdf_font_signature(), extension, section, section_records],
+                    ensure_ascii=False, default=json_default
+                ).encode('utf-8')).hexdigest()
+                shard = {
+                    "section": section,
+                    "file": f"{number:03d}_{_slug(section)}{extension}",
+                    "records": len(section_records),
+                    "hash": digest,
+                }
+                shards.append(shard)
+                old = previous.get(section)
+                if old and old["hash"] == digest and old["file"] == shard["file"] \
+                        and os.path.exists(os.path.join(output_dir, shard["file"])):
+                    shard["pages"] = old["pages"]
+                else:
+                    tasks.append((shard, (section, section_records, os.path.join(output_dir, shard["file"]), pdf,
+                                          incremental)))
+
+            print(f"Shards: {len(tasks)} to render, {len(shards) - len(tasks)} unchanged")
+            in_workers = executor is not None or (jobs > 1 and len(tasks) > 1)
+            if executor is not None:
+                results = list(executor.map(_render_shard, [args for _, args in tasks]))
+            elif in_workers:
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    results = list(pool.map(_render_shard, [args for _, args in tasks]))
+            else:
+                results = [_render_shard(args) for _, args in tasks]
+            for (shard, _), (page_count, _) in zip(tasks, results):
+                shard["pages"] = page_count
+
+            with open(index_path, 'w', encoding='utf-8') as f:
+                json.dump({"shards": shards}, f, indent=2, ensure_ascii=False)
+
+            self.stats = {
+                "shards": len(shards),
+                "shards_rendered": len(tasks),
+                "pages": sum(shard["pages"] for shard in shards),
+                "worker_cpu_seconds": round(sum(cpu for _, cpu in results), 3) if in_workers else 0.0,
+            }
+            return index_path
+
+        except Exception as e:
+            print(f"Error generating shards: {e}")
+            return None
+
+
+def _slug(value):
+    """File-name-safe version of an attribute value (keeps Cyrillic letters)."""
+    return re.sub(r'\W+', '_', value).strip('_')[:60] or 'section'
+
+
+def _render_shard(args):
+    """
+    Render one section shard (runs in a worker process).
+
+    Returns:
+        tuple: Number of pages in the shard and the CPU seconds spent on it
+    """
+    section, records, path, pdf, incremental = args
+    start = time.process_time()
+    generator = PDFGenerator()
+    if pdf:
+        if not generator.generate_pdf(records, path, incremental=incremental, section=section):
+            raise RuntimeError(f"PDF generation failed for section {section}")
+        return generator.stats["pdf_pages"], time.process_time() - start
+    generator.render_html(records, path, section=section)
+    return len(records), time.process_time() - start
+
+
+def _render_pdf_chunk(html, path, unit_count):
+    """
+    Render a chunk of page units to one PDF document (runs in a worker process).
+
+    xhtml2pdf (and reportlab) are imported here, so the HTML preview never loads them.
+    The PDF fonts are registered on the first chunk a process renders and reused
+    by every later chunk.
+
+    Args:
+        html (str): The chunk's pages, rendered by the template in PDF mode
+        path (str): Where to write the PDF
+        unit_count (int): Number of page units in html
+
+    Returns:
+        tuple: path, (start, pages) of every unit in the document, render time and
+            CPU time of this process in seconds
+    """
+    from pypdf import PdfReader
+    from xhtml2pdf import pisa
+
+    register_pdf_fonts()
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    with open(path, 'wb') as output_file:
+        pisa_status = pisa.CreatePDF(html, dest=output_file, encoding='utf-8')
+    if pisa_status.err:
+        raise RuntimeError(f"xhtml2pdf failed to render {os.path.basename(path)}")
+
+    # Each unit starts on the page of its title, the only top-level outline entries
+    reader = PdfReader(path)
+    starts = [reader.get_destination_page_number(entry) for entry in reader.outline if not isinstance(entry, list)]
+    if len(starts) != unit_count:
+        raise RuntimeError(f"{os.path.basename(path)} has {len(starts)} page titles for {unit_count} units")
+    ends = starts[1:] + [len(reader.pages)]
+    ranges = [(first, end - first) for first, end in zip(starts, ends)]
+    return path, ranges, time.perf_counter() - start, time.process_time() - cpu_start
+
+
+def _load_manifest(manifest_path, pdf_path):
+    """Read the previous build's unit entries, keyed by unit key; empty if unusable."""
+    if not (os.path.exists(manifest_path) and os.path.exists(pdf_path)):
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return {unit["key"]: unit for unit in json.load(f)["units"]}
+    except (ValueError, KeyError):
+        return {}
+
+
+def _splice_pdf(units, previous, previous_pdf_path, merged_path):
+    """
+    Assemble the new PDF from freshly rendered units and unchanged pages of the previous PDF.
+
+    Returns:
+        dict: Manifest describing the page range and hash of every unit
+    """
+    from pypdf import PdfReader, PdfWriter
+
+    previous_pages = PdfReader(previous_pdf_path).pages if any("path" not in unit for unit in units) else []
+    # One reader per chunk, so its pages keep sharing the chunk's font objects
+    chunk_pages = {}
+    writer = PdfWriter()
+    page_size = None
+    entries = []
+    for unit in units:
+        if "path" in unit:
+            if unit["path"] not in chunk_pages:
+                chunk_pages[unit["path"]] = PdfReader(unit["path"]).pages
+            pages = chunk_pages[unit["path"]][unit["start"]:unit["start"] + unit["pages"]]
+        else:
+            entry = previous[unit["key"]]
+            pages = previous_pages[entry["start"]:entry["start"] + entry["pages"]]
+
+        entries.append({"key": unit["key"], "hash": unit["hash"], "start": len(writer.pages), "pages": len(pages)})
+        for page in pages:
+            size = (round(float(page.mediabox.width)), round(float(page.mediabox.height)))
+            if page_size is None:
+                page_size = size
+            elif size != page_size:
+                raise ValueError(f"Inconsistent page size {size} for {unit['key']}, expected {page_size}")
+            writer.add_page(page)
+
+    with open(merged_path, 'wb') as output_file:
+        writer.write(output_file)
+    return {"units": entries}
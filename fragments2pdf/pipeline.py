@@ -0,0 +1,222 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+from fragment import Fragment, json_default
+
+_DONE = object()
+
+
+def prefetch(iterable, max_buffered):
+    """
+    Run an iterable in a background thread, buffering at most max_buffered items.
+
+    Lets network-bound producers (Airtable paging, comment calls) run ahead
+    while the caller does CPU work on earlier items. Exceptions raised by the
+    producer are re-raised in the consuming thread.
+
+    Args:
+        iterable: Source of items
+        max_buffered (int): Maximum number of items waiting to be consumed
+
+    Yields:
+        Items of iterable, in order
+    """
+    buffer = queue.Queue(maxsize=max(1, max_buffered))
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                buffer.put((item, None))
+        except BaseException as e:
+            buffer.put((_DONE, e))
+            return
+        buffer.put((_DONE, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full buffer so it can notice the stop flag
+        while thread.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                thread.join(timeout=0.05)
+
+
+def batched(iterable, size):
+    """
+    Group an iterable into lists of at most size items.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class JsonArrayWriter:
+    def __init__(self, path):
+        """
+        Write a JSON array one element at a time.
+
+        The output is byte-identical to json.dump(items, f, indent=2,
+        ensure_ascii=False, default=str), without holding all items at once.
+        Fragment items are written as the dicts they replace.
+
+        Args:
+            path (str): Output file path
+        """
+        self.file = open(path, 'w', encoding='utf-8')
+        self.count = 0
+
+    def write(self, item):
+        element = json.dumps(item, indent=2, ensure_ascii=False, default=json_default)
+        self.file.write(("[\n  " if self.count == 0 else ",\n  ") + element.replace("\n", "\n  "))
+        self.count += 1
+
+    def close(self):
+        self.file.write("\n]" if self.count else "[]")
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SnapshotWriter:
+    # First line of every snapshot; bump the version when the record shape changes
+    HEADER = {"format": "fragments2pdf-snapshot", "version": 1}
+
+    def __init__(self, path, filters=None):
+        """
+        Write fetched records as a compact JSON Lines snapshot, one record per line.
+
+        Records are written as they arrive, into a temporary file that replaces
+        path on close, so an interrupted run never leaves a truncated snapshot
+        behind. Used as a context manager, a run that wrote no records leaves the
+        previous snapshot in place as well. read_snapshot() streams the records
+        back. The filters of the run are kept in the header line, so a replay can
+        tell a partial snapshot from a full one (see snapshot_filters()).
+
+        Args:
+            path (str): Snapshot path, e.g. output/snapshot.jsonl
+            filters (dict, optional): Filters the records were selected with, by name;
+                unset filters are left out
+        """
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.file = open(self.tmp_path, 'w', encoding='utf-8')
+        filters = _set_filters(filters)
+        self.file.write(json.dumps({**self.HEADER, "filters": filters}, ensure_ascii=False, default=json_default) + "\n")
+        self.count = 0
+
+    def write(self, item):
+        self.file.write(json.dumps(item, ensure_ascii=False, separators=(',', ':'), default=json_default) + "\n")
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None and self.count:
+            self.close()
+        else:
+            self.abort()
+
+
+def _set_filters(filters):
+    """Filters that were actually set, with sets sorted so they serialize the same way every run."""
+    return {name: sorted(value) if isinstance(value, set) else value
+            for name, value in (filters or {}).items() if value}
+
+
+def snapshot_path(path, filters=None):
+    """
+    Where a run with these filters writes its snapshot.
+
+    An unfiltered run writes path itself. A filtered run writes next to it, under
+    a name derived from its filters (e.g. output/snapshot.3f2a9c1e07.jsonl), so it
+    never replaces the snapshot of the whole table or of a differently filtered run.
+
+    Args:
+        path (str): Snapshot path of an unfiltered run, e.g. output/snapshot.jsonl
+        filters (dict, optional): Filters the records are selected with, by name
+
+    Returns:
+        str: Snapshot path for the run
+    """
+    filters = _set_filters(filters)
+    if not filters:
+        return path
+    digest = hashlib.sha1(json.dumps(filters, sort_keys=True, ensure_ascii=False, default=json_default)
+                          .encode('utf-8')).hexdigest()[:10]
+    root, ext = os.path.splitext(path)
+    return f"{root}.{digest}{ext}"
+
+
+def _read_header(f, path):
+    header = json.loads(f.readline() or 'null')
+    if not isinstance(header, dict) or {key: header.get(key) for key in SnapshotWriter.HEADER} != SnapshotWriter.HEADER:
+        raise ValueError(f"{path} is not a version {SnapshotWriter.HEADER['version']} fragments2pdf snapshot")
+    return header
+
+
+def snapshot_filters(path):
+    """
+    Filters the run that wrote a snapshot was limited to.
+
+    Args:
+        path (str): Snapshot path
+
+    Returns:
+        dict: Filter values by name (fragment_ids, modified_since, attributes, query); empty for a full snapshot
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return _read_header(f, path).get("filters") or {}
+
+
+def read_snapshot(path):
+    """
+    Stream the records of a snapshot written by SnapshotWriter.
+
+    Args:
+        path (str): Snapshot path
+
+    Yields:
+        Fragment: Records in the order they were fetched
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        _read_header(f, path)
+        for line in f:
+            data = json.loads(line)
+            if data.get('last_modified'):
+                data['last_modified'] = datetime.fromisoformat(data['last_modified'])
+            yield Fragment.from_dict(data)
@@ -0,0 +1,32 @@
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, requests_per_second):
+        """
+        Initialize a thread-safe limiter that spaces calls evenly in time.
+
+        Args:
+            requests_per_second (float): Maximum number of calls allowed per second.
+                A value of 0 or None disables limiting.
+        """
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self):
+        """
+        Block until the caller is allowed to make the next request.
+        """
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
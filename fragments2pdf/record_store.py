@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+
+class RecordStore:
+    def __init__(self, path):
+        """
+        Open (or create) the local SQLite mirror of the Airtable table.
+
+        Args:
+            path (str): Path to the SQLite database file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS records (
+                id TEXT PRIMARY KEY,
+                position INTEGER NOT NULL DEFAULT 0,
+                sequence INTEGER,
+                last_modified TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS comments (
+                record_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (record_id, position)
+            );
+            CREATE TABLE IF NOT EXISTS record_attributes (
+                attribute TEXT NOT NULL,
+                record_id TEXT NOT NULL,
+                PRIMARY KEY (attribute, record_id)
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(
+                id UNINDEXED, title, content, comments, attribute1
+            );
+        """)
+        # Stores synced before the index existed are indexed once on open
+        counts = self.connection.execute(
+            "SELECT (SELECT COUNT(*) FROM records), (SELECT COUNT(*) FROM records_fts)").fetchone()
+        if counts[0] != counts[1]:
+            self.rebuild_index()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def high_water_mark(self):
+        """
+        Returns:
+            datetime: Latest last-modified time among stored records, or None if empty.
+        """
+        row = self.connection.execute("SELECT MAX(last_modified) FROM records").fetchone()
+        return datetime.fromisoformat(row[0]) if row[0] else None
+
+    def record_ids(self):
+        return {row[0] for row in self.connection.execute("SELECT id FROM records")}
+
+    def upsert(self, record, comments):
+        """
+        Insert or replace a validated record together with its comment texts.
+
+        Args:
+            record (dict): Record as returned by AirtableClient._validate_record
+            comments (list): Comment texts in Airtable order
+        """
+        data = {key: value for key, value in record.items() if key != 'last_modified'}
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO records (id, sequence, last_modified, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET sequence = excluded.sequence, "
+                "last_modified = excluded.last_modified, data = excluded.data",
+                (record['id'], record['sequence'], record['last_modified'].isoformat(),
+                 json.dumps(data, ensure_ascii=False))
+            )
+            self.connection.execute("DELETE FROM comments WHERE record_id = ?", (record['id'],))
+            self.connection.executemany(
+                "INSERT INTO comments (record_id, position, text) VALUES (?, ?, ?)",
+                [(record['id'], position, text) for position, text in enumerate(comments)]
+            )
+            self._index(record, comments)
+
+    def _index(self, record, comments):
+        """Replace the search index entries of a record (call inside a transaction)."""
+        self.connection.execute("DELETE FROM records_fts WHERE id = ?", (record['id'],))
+        self.connection.execute("DELETE FROM record_attributes WHERE record_id = ?", (record['id'],))
+        attributes = record.get('attribute1') or []
+        self.connection.execute(
+            "INSERT INTO records_fts (id, title, content, comments, attribute1) VALUES (?, ?, ?, ?, ?)",
+            (record['id'], _fold(record.get('title') or ''), _fold(record.get('content') or ''),
+             _fold('\n'.join(comments)), _fold('\n'.join(attributes)))
+        )
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO record_attributes (attribute, record_id) VALUES (?, ?)",
+            [(attribute, record['id']) for attribute in attributes]
+        )
+
+    def rebuild_index(self):
+        """Rebuild the full-text and attribute index from the stored records and comments."""
+        comments = {}
+        for record_id, text in self.connection.execute(
+                "SELECT record_id, text FROM comments ORDER BY record_id, position"):
+            comments.setdefault(record_id, []).append(text)
+        with self.connection:
+            self.connection.execute("DELETE FROM records_fts")
+            self.connection.execute("DELETE FROM record_attributes")
+            for record_id, data in self.connection.execute("SELECT id, data FROM records").fetchall():
+                self._index(dict(json.loads(data), id=record_id), comments.get(record_id, []))
+
+    def delete(self, record_ids):
+        with self.connection:
+            for record_id in record_ids:
+                self.connection.execute("DELETE FROM records WHERE id = ?", (record_id,))
+                self.connection.execute("DELETE FROM comments WHERE record_id = ?", (record_id,))
+                self.connection.execute("DELETE FROM records_fts WHERE id = ?", (record_id,))
+                self.connection.execute("DELETE FROM record_attributes WHERE record_id = ?", (record_id,))
+
+    def search(self, query=None, attributes=None):
+        """
+        Look up record IDs in the local index, without reading the records.
+
+        Args:
+            query (str, optional): FTS5 query over title, content, comments and attribute1,
+                e.g. 'креатив*', 'title:детство' or 'семья NOT работа'; ё and е match each other
+            attributes (list, optional): Only match records tagged with one of these attributes
+
+        Returns:
+            set: Matching record IDs
+        """
+        ids = None
+        if query:
+            try:
+                ids = {row[0] for row in self.connection.execute(
+                    "SELECT id FROM records_fts WHERE records_fts MATCH ?", (_fold(query),))}
+            except sqlite3.OperationalError as e:
+                raise ValueError(f"Invalid search query {query!r}: {e}") from None
+        if attributes:
+            placeholders = ', '.join('?' * len(attributes))
+            tagged = {row[0] for row in self.connection.execute(
+                f"SELECT record_id FROM record_attributes WHERE attribute IN ({placeholders})", list(attributes))}
+            ids = tagged if ids is None else ids & tagged
+        return ids
+
+    def set_order(self, record_ids):
+        """
+        Store the table order (Airtable sort by attribute) of all record IDs.
+
+        Args:
+            record_ids (list): Record IDs in display order
+        """
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE records SET position = ? WHERE id = ?",
+                [(position, record_id) for position, record_id in enumerate(record_ids)]
+            )
+
+    def get_records(self, modified_since=None, fragment_ids=None, attributes=None, query=None):
+        """
+        Read stored records in table order.
+
+        Args:
+            modified_since (datetime, optional): Only return records modified on or after this date.
+            fragment_ids (set, optional): Only return records with these sequence IDs.
+            attributes (list, optional): Only return records tagged with one of these attributes.
+            query (str, optional): Only return records matching this full-text query (see search()).
+
+        Returns:
+            list: List of (record, comment texts) tuples.
+        """
+        selected = self.search(query, attributes)
+        comments = {}
+        for record_id, text in self.connection.execute(
+                "SELECT record_id, text FROM comments ORDER BY record_id, position"):
+            comments.setdefault(record_id, []).append(text)
+
+        results = []
+        for record_id, sequence, last_modified, data in self.connection.execute(
+                "SELECT id, sequence, last_modified, data FROM records ORDER BY position"):
+            if selected is not None and record_id not in selected:
+                continue
+            last_modified = datetime.fromisoformat(last_modified)
+            if fragment_ids and sequence not in fragment_ids:
+                continue
+            if modified_since and last_modified < _as_utc(modified_since):
+                continue
+            record = json.loads(data)
+            record['last_modified'] = last_modified
+            results.append((record, comments.get(record_id, [])))
+        return results
+
+
+def _fold(text):
+    # unicode61 folds case but not ё to е, which Russian text uses interchangeably
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def _as_utc(value):
+    # Airtable parses naive dates in formulas as UTC, do the same locally
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
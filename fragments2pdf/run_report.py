@@ -0,0 +1,116 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import partial
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB (None where unsupported)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _profile_thread(profilers, frame, event, arg):
+    """threading.setprofile hook: give a newly started thread a cProfile of its own."""
+    sys.setprofile(None)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    profilers.append(profiler)
+
+
+class RunReport:
+    def __init__(self, profile_dir=None):
+        """
+        Collect per-stage timings and counters for one pipeline run.
+
+        Args:
+            profile_dir (str, optional): If set, each stage is run under cProfile
+                and its stats are dumped to profile_<stage>.prof in this directory.
+                Threads started during the stage (the prefetching Airtable producer,
+                comment workers) are profiled too and merged into the same file
+        """
+        self.profile_dir = profile_dir
+        self.started = datetime.now(timezone.utc)
+        self.stages = {}
+        self.sections = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measure a stage: wall time, CPU time of this process and memory.
+
+        Worker pools may outlive a stage (or be shared by several runs), so
+        their CPU time is not read from finished child processes: callers set
+        'worker_cpu_seconds' from what the workers report for their tasks.
+        ru_maxrss only grows, so each stage records the process peak so far
+        (process_peak_rss_mb) and how much the stage raised it (rss_growth_mb).
+
+        Yields:
+            dict: Stage entry; callers may set 'items', 'worker_cpu_seconds' and other counters on it
+        """
+        entry = self.stages.setdefault(name, {})
+        profiler = cProfile.Profile() if self.profile_dir else None
+        thread_profilers = []
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        rss_start = peak_rss_mb()
+        if profiler:
+            # cProfile only sees the thread that enabled it
+            threading.setprofile(partial(_profile_thread, thread_profilers))
+            profiler.enable()
+        try:
+            yield entry
+        finally:
+            if profiler:
+                profiler.disable()
+                threading.setprofile(None)
+                stats = pstats.Stats(profiler)
+                for thread_profiler in thread_profilers:
+                    stats.add(thread_profiler)
+                os.makedirs(self.profile_dir, exist_ok=True)
+                stats.dump_stats(os.path.join(self.profile_dir, f'profile_{name}.prof'))
+            entry['wall_seconds'] = round(time.perf_counter() - wall_start, 3)
+            entry['cpu_seconds'] = round(time.process_time() - cpu_start, 3)
+            entry['worker_cpu_seconds'] = round(entry.get('worker_cpu_seconds', 0.0), 3)
+            entry['process_peak_rss_mb'] = peak_rss_mb()
+            if rss_start is not None:
+                entry['rss_growth_mb'] = round(entry['process_peak_rss_mb'] - rss_start, 1)
+
+    def add(self, section, stats):
+        """Attach a component's counters (e.g. AirtableClient.stats) under a section name."""
+        self.sections[section] = dict(stats)
+
+    def to_dict(self, **extra):
+        return {
+            "started": self.started.isoformat(),
+            "finished": datetime.now(timezone.utc).isoformat(),
+            **extra,
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+            **self.sections,
+        }
+
+    def write(self, path, **extra):
+        """
+        Write the report as JSON.
+
+        Args:
+            path (str): Output path, usually output/run_report.json
+            **extra: Top-level fields such as success or record_count
+        """
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(**extra), f, indent=2, ensure_ascii=False, default=str)
@@ -0,0 +1,151 @@
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from config import Config
+from airtable_client import AirtableClient, read_stored_records
+from rate_limiter import RateLimiter
+from record_store import RecordStore
+
+
+def make_airtable_record(record_id, sequence):
+    return {
+        'id': record_id,
+        'fields': {
+            Config.FIELD_TITLE: f'Title {sequence}',
+            Config.FIELD_SEQUENCE: sequence,
+            Config.FIELD_ATTRIBUTE1: ['Attr'],
+            Config.FIELD_CONTENT: f'Content {sequence}',
+            Config.FIELD_LAST_MODIFIED: '2025-04-30T07:18:59.000Z',
+        }
+    }
+
+
+@patch.multiple(Config, AIRTABLE_API_KEY='key', AIRTABLE_BASE_ID='app', AIRTABLE_TABLE_ID='tbl',
+                AIRTABLE_REQUESTS_PER_SECOND=0, COMMENT_WORKERS=4)
+class TestAirtableClient(unittest.TestCase):
+    @patch('airtable_client._create_api')
+    def test_comments_fetched_concurrently_in_record_order(self, MockApi):
+        """Comments are merged into the right records regardless of completion order."""
+        table = MockApi.return_value.table.return_value
+        all_records = [make_airtable_record(f'rec{i}', i) for i in range(8)]
+        table.iterate.return_value = iter([all_records[:5], all_records[5:]])
+
+        def comments(record_id):
+            index = int(record_id[3:])
+            time.sleep(0.01 * (8 - index))
+            return [SimpleNamespace(text=f'question {index}')] if index % 2 else []
+        table.comments.side_effect = comments
+
+        records = AirtableClient().get_records()
+
+        self.assertEqual([r['id'] for r in records], [f'rec{i}' for i in range(8)])
+        self.assertEqual(records[0]['content'], 'Content 0')
+        self.assertIn('Q: question 1</span>\n\nContent 1', records[1]['content'])
+        self.assertEqual(table.comments.call_count, 8)
+
+    @patch('airtable_client._create_api')
+    def test_sync_fetches_delta_and_drops_deleted(self, MockApi):
+        table = MockApi.return_value.table.return_value
+        table.comments.return_value = [SimpleNamespace(text='why?')]
+
+        with tempfile.TemporaryDirectory() as tmpdir, RecordStore(os.path.join(tmpdir, 'records.sqlite')) as store:
+            client = AirtableClient()
+            all_records = [make_airtable_record('rec1', 1), make_airtable_record('rec2', 2)]
+            table.iterate.side_effect = [iter([all_records]), iter([all_records])]
+            self.assertEqual(client.sync(store), {"updated": 2, "deleted": 0})
+
+            changed = make_airtable_record('rec2', 2)
+            changed['fields'][Config.FIELD_CONTENT] = 'Edited'
+            table.iterate.side_effect = [iter([[changed]]), iter([[changed]])]
+            self.assertEqual(client.sync(store), {"updated": 1, "deleted": 1})
+            self.assertIn("NOT(IS_BEFORE", table.iterate.call_args.kwargs['formula'])
+            # The ID listing and the delta of both syncs
+            self.assertEqual(client.stats['list_pages'], 4)
+
+            records = read_stored_records(store)
+            self.assertEqual([r['id'] for r in records], ['rec2'])
+            self.assertTrue(records[0]['content'].endswith('Q: why?</span>\n\nEdited'))
+
+
+    @patch.object(Config, 'FORMULA_BATCH_SIZE', 50)
+    @patch('airtable_client._create_api')
+    def test_large_filters_split_into_concurrent_batches(self, MockApi):
+        """120 IDs x 2 attributes become 3 bounded formulas; results are merged, deduplicated and put in server order."""
+        table = MockApi.return_value.table.return_value
+        table.comments.return_value = []
+        records = {}
+        for i in range(120):
+            record = make_airtable_record(f'rec{i}', i)
+            record['fields'][Config.FIELD_ATTRIBUTE1] = ['B'] if i % 2 else ['A', 'B']
+            records[i] = record
+        # Airtable sorts the multi-select by option order (B before A here), not alphabetically
+        server_order = [f'rec{i}' for i in range(1, 120, 2)] + [f'rec{i}' for i in range(0, 120, 2)]
+
+        def iterate(formula=None, **options):
+            if options['fields'] == [Config.FIELD_LAST_MODIFIED]:
+                self.assertIsNone(formula)
+                yield [{'id': record_id} for record_id in server_order]
+                return
+            self.assertEqual(options['fields'], AirtableClient().required_fields)
+            ids = [int(part.split('}=')[1]) for part in formula.split('OR(', 1)[1].split('),', 1)[0].split(',')]
+            self.assertLessEqual(len(ids), 50)
+            # Each batch comes back in Airtable's own order, newest first here
+            yield [records[i] for i in sorted(ids, reverse=True)]
+        table.iterate.side_effect = iterate
+
+        fetched = AirtableClient().get_records(fragment_ids=set(range(120)), attributes=['A', 'B'])
+
+        batch_calls = [call for call in table.iterate.call_args_list if 'formula' in call.kwargs]
+        self.assertEqual(len(batch_calls), 3)
+        formula = batch_calls[0].kwargs['formula']
+        self.assertIn('FIND("|A|", "|" & ARRAYJOIN({Атрибут 1}, "|") & "|")', formula)
+        self.assertEqual(len(fetched), 120)
+        self.assertEqual([r['id'] for r in fetched], server_order)
+
+    @patch.object(Config, 'FORMULA_BATCH_SIZE', 2)
+    @patch('airtable_client._create_api')
+    def test_batched_id_listing_keeps_server_order(self, MockApi):
+        """Watch mode and sharding see the same order as an unbatched listing."""
+        table = MockApi.return_value.table.return_value
+        server_order = ['rec5', 'rec1', 'rec4', 'rec2', 'rec3', 'rec9']
+
+        def list_ids(**options):
+            formula = options.get('formula')
+            if not formula:
+                yield [{'id': record_id} for record_id in server_order]
+                return
+            ids = {int(part.split('}=')[1]) for part in formula[3:-1].split(',')}
+            # Each batch arrives in its own order
+            yield [{'id': record_id} for record_id in reversed(server_order) if int(record_id[3:]) in ids]
+        table.iterate.side_effect = list_ids
+
+        limiter = MagicMock()
+        client = AirtableClient(rate_limiter=limiter)
+        listed = client.list_record_ids(fragment_ids={1, 2, 3, 4, 5})
+        self.assertEqual(table.iterate.call_count, 4)
+        self.assertEqual(listed, ['rec5', 'rec1', 'rec4', 'rec2', 'rec3'])
+        # Every listing request waits for the base's rate limiter and is counted
+        self.assertEqual(client.stats['list_pages'], 4)
+        self.assertGreaterEqual(limiter.acquire.call_count, 4)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_spaces_requests(self):
+        limiter = RateLimiter(50)
+        start = time.monotonic()
+        for _ in range(6):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 5 / 50 - 0.01)
+
+    def test_disabled(self):
+        limiter = RateLimiter(0)
+        start = time.monotonic()
+        for _ in range(100):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import patch
+from config import Config
+from airtable_client import AirtableClient
+from airtable_standin import AirtableStandIn, records_from_clean_json
+
+CLEAN_RECORDS = [
+    {
+        'id': f'rec{i:014d}',
+        'title': f'Фрагмент {i}',
+        'sequence': i,
+        'attribute1': ['Атрибут'],
+        'content': ('<span style="color:#AFABAB;mso-style-textfill-fill-color:#AFABAB;">Q: Почему?</span>\n\n'
+                    if i == 3 else '') + f'Текст {i}\n',
+        'last_modified': '2025-04-30 07:18:59+00:00',
+    }
+    for i in range(1, 6)
+]
+
+
+class TestAirtableStandIn(unittest.TestCase):
+    def test_seed_splits_merged_comments(self):
+        records, comments = records_from_clean_json(CLEAN_RECORDS)
+        self.assertEqual(records[2]['fields'][Config.FIELD_CONTENT], 'Текст 3\n')
+        self.assertEqual([c['text'] for c in comments[records[2]['id']]], ['Почему?'])
+
+    def test_client_round_trip_with_paging_and_429(self):
+        """AirtableClient reproduces records_clean.json through paging, comments and retried 429s."""
+        records, comments = records_from_clean_json(CLEAN_RECORDS)
+        with AirtableStandIn(records, comments, page_size=2, rate_limit_every=4) as standin:
+            with patch.multiple(Config, AIRTABLE_API_KEY='key', AIRTABLE_BASE_ID='app', AIRTABLE_TABLE_ID='tbl',
+                                AIRTABLE_ENDPOINT_URL=standin.endpoint_url, AIRTABLE_REQUESTS_PER_SECOND=0):
+                client = AirtableClient()
+                fetched = client.get_records()
+
+        self.assertEqual([r['content'] for r in fetched], [r['content'] for r in CLEAN_RECORDS])
+        self.assertGreater(standin.stats['rate_limited'], 0)
+        # 3 list pages + 5 comment calls, plus the retried ones
+        self.assertEqual(standin.stats['requests'] - standin.stats['rate_limited'], 8)
+        self.assertEqual(client.stats['http_requests'], standin.stats['requests'])
+        self.assertEqual(client.stats['http_retries'], standin.stats['rate_limited'])
+        self.assertEqual((client.stats['list_pages'], client.stats['comment_calls']), (3, 5))
+
+    def test_only_pipeline_columns_are_transferred(self):
+        """Unused columns of a wide table stay on the server; counting lists IDs only."""
+        records, comments = records_from_clean_json(CLEAN_RECORDS)
+        for record in records:
+            record['fields']['Расшифровка'] = 'x' * 10000
+        with AirtableStandIn(records, comments) as standin:
+            with patch.multiple(Config, AIRTABLE_API_KEY='key', AIRTABLE_BASE_ID='app', AIRTABLE_TABLE_ID='tbl',
+                                AIRTABLE_ENDPOINT_URL=standin.endpoint_url, AIRTABLE_REQUESTS_PER_SECOND=0):
+                client = AirtableClient()
+                fetched = client.get_records()
+                self.assertLess(standin.stats['bytes_sent'], 10000)
+
+                sent = standin.stats['bytes_sent']
+                self.assertEqual(client.get_record_count(), 5)
+                self.assertEqual(client.list_record_ids(), [r['id'] for r in CLEAN_RECORDS])
+                # IDs plus one timestamp column, not the content
+                self.assertLess(standin.stats['bytes_sent'] - sent, 2 * 5 * 200)
+
+        self.assertEqual([r['content'] for r in fetched], [r['content'] for r in CLEAN_RECORDS])
+
+if __name__ == '__main__':
+    unittest.main()
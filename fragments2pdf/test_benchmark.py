@@ -0,0 +1,60 @@
+import unittest
+from benchmark import CorpusGenerator, run_benchmark
+
+SEED_RECORDS = [
+    {
+        "id": "rec1",
+        "title": "Первый фрагмент",
+        "sequence": 1,
+        "attribute1": ["Детство", "Семья"],
+        "content": '<span style="color:#AFABAB;mso-style-textfill-fill-color:#AFABAB;">Q: Где вы родились?</span>\n\n'
+                   "**ИНТЕРВЬЮЕР:**\nЯ родился в деревне.\n\n----\n\nПотом мы переехали.",
+        "last_modified": "2025-04-30 10:00:00+00:00",
+    },
+    {
+        "id": "rec2",
+        "title": "Второй",
+        "sequence": 2,
+        "attribute1": ["Работа"],
+        "content": "Работал на заводе много лет.",
+        "last_modified": "2025-04-30 11:00:00+00:00",
+    },
+]
+
+
+class TestCorpusGenerator(unittest.TestCase):
+    def test_generated_records_keep_shape(self):
+        records = list(CorpusGenerator(SEED_RECORDS, seed=1).generate(50))
+
+        self.assertEqual(len(records), 50)
+        self.assertEqual(len({record["id"] for record in records}), 50)
+        self.assertEqual([record["sequence"] for record in records], list(range(1, 51)))
+        for record in records:
+            self.assertEqual(set(record), set(SEED_RECORDS[0]))
+            self.assertIn(record["attribute1"], [seed["attribute1"] for seed in SEED_RECORDS])
+            if len(record["attribute1"]) > 1:
+                # Markup and the merged comment span survive, words are replaced
+                self.assertTrue(record["content"].startswith('<span style="color:#AFABAB;'))
+                self.assertIn("</span>\n\n**", record["content"])
+                self.assertIn("\n\n----\n\n", record["content"])
+
+    def test_same_seed_same_corpus(self):
+        first = list(CorpusGenerator(SEED_RECORDS, seed=7).generate(20))
+        second = list(CorpusGenerator(SEED_RECORDS, seed=7).generate(20))
+        self.assertEqual(first, second)
+
+
+class TestRunBenchmark(unittest.TestCase):
+    def test_stages_are_timed_separately(self):
+        records = list(CorpusGenerator(SEED_RECORDS).generate(5))
+        results = run_benchmark(records, stages=["convert", "fit", "render"])
+
+        self.assertEqual(set(results), {"convert", "fit", "render"})
+        for result in results.values():
+            self.assertEqual(result["items"], 5)
+            self.assertGreaterEqual(result["wall_seconds"], 0)
+        self.assertGreater(results["render"]["html_bytes"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+from config import Config
+from fonts import FontMetrics, find_font_file, register_pdf_fonts
+
+FONT_FILE = find_font_file(Config.CONTENT_FONT_FILES)
+
+
+@unittest.skipUnless(FONT_FILE, "no TTF font available")
+class TestFonts(unittest.TestCase):
+    def test_metrics_cached_on_disk_match_reportlab(self):
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        text = "Креативность — это «нестандартные» подходы, 1985!"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            parsed = FontMetrics.load(FONT_FILE, cache_dir=tmpdir)
+            with patch('reportlab.pdfbase.ttfonts.TTFontFile', side_effect=AssertionError("font parsed again")):
+                cached = FontMetrics.load(FONT_FILE, cache_dir=tmpdir)
+
+        expected = TTFont('reference', FONT_FILE).stringWidth(text, 11)
+        self.assertEqual(parsed.string_width(text, 11), expected)
+        self.assertEqual(cached.string_width(text, 11), expected)
+
+    def test_pdf_family_registered_once_per_process(self):
+        from xhtml2pdf import default
+
+        with patch.object(Config, 'PDF_FONT_FILES', [FONT_FILE]):
+            name = register_pdf_fonts()
+            self.assertEqual(default.DEFAULT_FONT[Config.PDF_FONT_FAMILY.lower()], name)
+            with patch('reportlab.pdfbase.ttfonts.TTFont', side_effect=AssertionError("font registered again")):
+                self.assertEqual(register_pdf_fonts(), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from fragment import Fragment, fit_key
+from pipeline import JsonArrayWriter
+
+RECORD = {
+    'id': 'rec1',
+    'title': 'Фрагмент',
+    'sequence': 1,
+    'attribute1': ['Детство', 'Семья'],
+    'content': '**Текст**',
+    'last_modified': datetime(2025, 4, 30, 7, 18, 59, tzinfo=timezone.utc),
+}
+
+
+class TestFragment(unittest.TestCase):
+    def test_behaves_like_the_record_dict(self):
+        fragment = Fragment.from_dict(RECORD)
+        self.assertFalse(hasattr(fragment, '__dict__'))
+        self.assertEqual(fragment['title'], 'Фрагмент')
+        self.assertNotIn('content_html', fragment)
+        self.assertIsNone(fragment.get('content_html'))
+        with self.assertRaises(KeyError):
+            fragment['unknown'] = 1
+
+        fragment['content_html'] = '<p>a</p>'
+        self.assertEqual(fragment.keys(), list(RECORD) + ['content_html'])
+        self.assertEqual(pickle.loads(pickle.dumps(fragment)), fragment)
+
+    def test_attribute_values_are_interned(self):
+        first = Fragment.from_dict(dict(RECORD, attribute1=[''.join(['Дет', 'ство'])]))
+        second = Fragment.from_dict(dict(RECORD, attribute1=[''.join(['Детс', 'тво'])]))
+        self.assertIs(first.attribute1[0], second.attribute1[0])
+
+    def test_fit_key_follows_content_html(self):
+        fragment = Fragment.from_dict(dict(RECORD, content_html='<p>a</p>'))
+        self.assertEqual(fragment.fit_key, fit_key('<p>a</p>'))
+        fragment['content_html'] = '<p>b</p>'
+        self.assertEqual(fragment.fit_key, fit_key('<p>b</p>'))
+
+    def test_json_writer_output_unchanged(self):
+        records = [dict(RECORD, content_html='<p>a</p>', content_font_size=9.5), dict(RECORD, id='rec2')]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'records.json')
+            with JsonArrayWriter(path) as writer:
+                for record in records:
+                    writer.write(Fragment.from_dict(record))
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(f.read(), json.dumps(records, indent=2, ensure_ascii=False, default=str))
+
+
+if __name__ == '__main__':
+    unittest.main()
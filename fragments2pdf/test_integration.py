@@ -1,7 +1,20 @@
+import json
+import subprocess
+import sys
 import unittest
 import os
+import tempfile
+from datetime import datetime, timezone
 from unittest.mock import patch, MagicMock
-from main import process_airtable_to_pdf
+from airtable_client import shared_api
+from airtable_standin import AirtableStandIn, records_from_clean_json
+from config import Config
+from disk_cache import DiskCache
+from main import load_manifest, process_airtable_to_pdf, run_batch
+from pipeline import snapshot_path
+from rate_limiter import RateLimiter
+from record_store import RecordStore
+from test_airtable_standin import CLEAN_RECORDS
 
 class TestIntegration(unittest.TestCase):
     @patch('main.AirtableClient')
@@ -41,5 +54,135 @@ class TestIntegration(unittest.TestCase):
         self.assertFalse(result.success)
         self.assertIn('Airtable error', result.error)
 
+    def test_failed_run_keeps_cached_conversions(self):
+        def failing_records(**filters):
+            yield {'id': 'rec1', 'title': 'Title', 'sequence': 1, 'attribute1': ['Attr1'], 'content': 'Text **1**'}
+            raise Exception('Airtable error')
+
+        client = MagicMock()
+        client.iter_records.side_effect = failing_records
+        with tempfile.TemporaryDirectory() as tmpdir, patch.object(Config, 'PIPELINE_BATCH_SIZE', 1):
+            result = process_airtable_to_pdf(output_dir=tmpdir, airtable_client=client, fit=False)
+            self.assertFalse(result["success"])
+            self.assertIn('Airtable error', result["error"])
+            with DiskCache(os.path.join(tmpdir, 'markdown_cache.sqlite')) as cache:
+                self.assertEqual(cache.connection.execute("SELECT value FROM markdown_html").fetchall(),
+                                 [('<p>Text <strong>1</strong></p>',)])
+
+    @patch.multiple(Config, AIRTABLE_API_KEY=None, AIRTABLE_BASE_ID=None, AIRTABLE_TABLE_ID=None)
+    def test_local_selection_needs_no_credentials(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with RecordStore(os.path.join(tmpdir, 'records.sqlite')) as store:
+                for sequence, attribute in enumerate(['Работа', 'Детство', 'Работа'], 1):
+                    store.upsert({'id': f'rec{sequence}', 'title': f'Фрагмент {sequence}', 'sequence': sequence,
+                                  'attribute1': [attribute], 'content': f'Креативность {sequence}',
+                                  'last_modified': datetime(2025, 4, 30, tzinfo=timezone.utc)},
+                                 ['Почему?'] if sequence == 3 else [])
+                store.set_order(['rec1', 'rec2', 'rec3'])
+
+            with patch('main.AirtableClient', side_effect=AssertionError("contacted Airtable")):
+                for options in ({'local': True, 'attributes': ['Работа']}, {'query': 'креатив*', 'fragment_ids': {1, 3}}):
+                    result = process_airtable_to_pdf(output_dir=tmpdir, open_browser=False, fit=False, **options)
+                    self.assertTrue(result["success"], result.get("error"))
+                    self.assertEqual(result["record_count"], 2)
+            with open(os.path.join(tmpdir, 'preview.html'), encoding='utf-8') as f:
+                self.assertIn('Q: Почему?', f.read())
+            self.assertFalse([name for name in os.listdir(tmpdir) if name.startswith('snapshot')])
+
+    def test_replaying_a_filtered_snapshot_warns(self):
+        client = MagicMock()
+        client.iter_records.return_value = iter([
+            {'id': 'rec1', 'title': 'Title', 'sequence': 1, 'attribute1': ['Attr1'], 'content': 'Text'}
+        ])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            result = process_airtable_to_pdf(fragment_ids={1}, output_dir=tmpdir, airtable_client=client,
+                                             fit=False, open_browser=False)
+            self.assertTrue(result["success"], result.get("error"))
+            # The filtered run leaves the snapshot of the whole table alone
+            self.assertFalse(os.path.exists(os.path.join(tmpdir, 'snapshot.jsonl')))
+            with patch('builtins.print') as mock_print:
+                result = process_airtable_to_pdf(from_snapshot=snapshot_path(os.path.join(tmpdir, 'snapshot.jsonl'),
+                                                                             {"fragment_ids": {1}}),
+                                                 output_dir=tmpdir, fit=False, open_browser=False)
+            self.assertTrue(result["success"], result.get("error"))
+            warnings = [call.args[0] for call in mock_print.call_args_list if 'filtered run' in str(call.args)]
+            self.assertEqual(len(warnings), 1)
+            self.assertIn('fragment_ids=[1]', warnings[0])
+
+
+class TestBatch(unittest.TestCase):
+    def write_manifest(self, tmpdir, targets):
+        path = os.path.join(tmpdir, 'manifest.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"targets": targets}, f)
+        return path
+
+    def test_load_manifest(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            targets = load_manifest(self.write_manifest(tmpdir, [
+                {"name": "a", "base_id": "appA", "table_id": "tbl", "fragment_ids": [1, 2],
+                 "modified_since": "2025-04-30T00:00:00"},
+                {"name": "b", "base_id": "appB", "table_id": "tbl", "output_dir": tmpdir},
+            ]))
+            self.assertEqual(targets[0]["output_dir"], os.path.abspath(os.path.join('output', 'a')))
+            self.assertEqual(targets[0]["fragment_ids"], {1, 2})
+            self.assertEqual(targets[0]["modified_since"].year, 2025)
+            self.assertEqual(targets[1]["output_dir"], os.path.abspath(tmpdir))
+
+            for bad in ([], [{"name": "a", "base_id": "appA"}],
+                        [{"name": "a", "base_id": "appA", "table_id": "tbl", "colour": "red"}],
+                        [{"name": "a", "base_id": "appA", "table_id": "tbl", "output_dir": tmpdir},
+                         {"name": "b", "base_id": "appB", "table_id": "tbl", "output_dir": tmpdir}]):
+                with self.assertRaises(ValueError):
+                    load_manifest(self.write_manifest(tmpdir, bad))
+
+    def test_command_line_filters_are_target_defaults(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            targets = load_manifest(self.write_manifest(tmpdir, [
+                {"name": "a", "base_id": "appA", "table_id": "tbl", "output_dir": os.path.join(tmpdir, "a")},
+                {"name": "b", "base_id": "appB", "table_id": "tbl", "output_dir": os.path.join(tmpdir, "b"),
+                 "attributes": ["Детство"], "pdf": False},
+            ]))
+            with patch.object(Config, 'AIRTABLE_API_KEY', 'key'), \
+                    patch('main.process_airtable_to_pdf', return_value={"success": True}) as process:
+                run_batch(targets, fragment_ids={1, 2}, attributes=['Работа'], local=True, pdf=True)
+
+        options = {call.kwargs['output_dir']: call.kwargs for call in process.call_args_list}
+        a, b = options[targets[0]['output_dir']], options[targets[1]['output_dir']]
+        self.assertEqual((a['fragment_ids'], a['attributes'], a['local'], a['pdf']), ({1, 2}, ['Работа'], True, True))
+        self.assertEqual((b['fragment_ids'], b['attributes'], b['local'], b['pdf']), ({1, 2}, ['Детство'], True, False))
+
+    def test_flags_that_do_not_apply_are_rejected(self):
+        main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+        for flag in ('--profile', '--from-snapshot', '--count'):
+            result = subprocess.run([sys.executable, main_path, '--manifest', 'missing.json', flag],
+                                    capture_output=True, text=True)
+            self.assertEqual(result.returncode, 2)
+            self.assertIn(f"{flag} cannot be combined with --manifest", result.stderr)
+
+    def test_targets_share_session_and_per_base_limiters(self):
+        records, comments = records_from_clean_json(CLEAN_RECORDS)
+        with AirtableStandIn(records, comments, latency=0.01) as standin, tempfile.TemporaryDirectory() as tmpdir:
+            targets = load_manifest(self.write_manifest(tmpdir, [
+                {"name": name, "base_id": base_id, "table_id": "tbl", "output_dir": os.path.join(tmpdir, name)}
+                for name, base_id in (("a", "appA"), ("b", "appA"), ("c", "appB"))
+            ]))
+            with patch.multiple(Config, AIRTABLE_API_KEY='key', AIRTABLE_ENDPOINT_URL=standin.endpoint_url), \
+                    patch('main.shared_api', wraps=shared_api) as api_factory, \
+                    patch('main.RateLimiter', wraps=RateLimiter) as limiter_factory:
+                results = run_batch(targets, fit=False)
+
+            self.assertEqual([result["name"] for result in results], ["a", "b", "c"])
+            for result, target in zip(results, targets):
+                self.assertTrue(result["success"], result.get("error"))
+                self.assertEqual(result["record_count"], len(CLEAN_RECORDS))
+                self.assertEqual(os.path.dirname(result["output_path"]), target["output_dir"])
+                self.assertTrue(os.path.exists(os.path.join(target["output_dir"], 'preview.html')))
+                self.assertTrue(os.path.exists(os.path.join(target["output_dir"], 'markdown_cache.sqlite')))
+            api_factory.assert_called_once()
+            self.assertEqual(limiter_factory.call_count, 2)
+            # 1 list page and 5 comment calls per target
+            self.assertEqual(standin.stats["requests"], 3 * 6)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
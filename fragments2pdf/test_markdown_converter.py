@@ -1,5 +1,13 @@
+import html
+import importlib.util
+import json
+import os
+import re
+import tempfile
 import unittest
-from markdown_converter import MarkdownConverter
+from unittest.mock import patch
+from markdown_converter import MarkdownConverter, create_worker_pool
+from disk_cache import DiskCache
 
 class TestMarkdownConverter(unittest.TestCase):
     def setUp(self):
@@ -79,5 +87,152 @@ def hello():
         result = self.converter.convert_record(record)
         self.assertEqual(result, record)
 
+class TestParallelConversion(unittest.TestCase):
+    def test_matches_serial_output(self):
+        """Process pool output is byte-identical and in the same order as the serial path."""
+        with open(os.path.join(os.path.dirname(__file__), 'output', 'records_clean.json'), encoding='utf-8') as f:
+            records = json.load(f)[:40]
+        records.append({"id": "no-content"})
+
+        converter = MarkdownConverter()
+        serial = [converter.convert_record(dict(record)) for record in records]
+        parallel = converter.convert_records_parallel([dict(record) for record in records], jobs=2)
+        self.assertEqual(parallel, serial)
+
+    def test_workers_report_cpu_before_the_pool_is_joined(self):
+        converter = MarkdownConverter(fast_path=False)
+        pool = create_worker_pool(2)
+        try:
+            converter.convert_records_parallel([{"id": str(i), "content": f"# Heading {i}\n\n" + "*text* " * 2000}
+                                                for i in range(8)], jobs=2, executor=pool)
+            self.assertGreater(converter.stats["worker_cpu_seconds"], 0)
+        finally:
+            pool.shutdown()
+
+
+def visible_text(html_text):
+    return html.unescape(re.sub(r'<[^>]+>', ' ', html_text)).split()
+
+
+def load_processed_records():
+    with open(os.path.join(os.path.dirname(__file__), 'output', 'records_processed.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+class TestTieredConversion(unittest.TestCase):
+    # Inputs near the edge of what the plain-text fast path accepts
+    EDGE_CASES = [
+        "Просто текст",
+        "Первая строка\nвторая\n\nНовый абзац",
+        "**Вопрос:** ответ\n----\nдальше",
+        "**жирный\nна двух строках**",
+        "2 * 3 = 6",
+        "**b **и ** c**",
+        "***жирный курсив***",
+        "*курсив* и **жирный**",
+        "Текст\n---",
+        "---\n---",
+        "Заголовок\n===",
+        "--- - ---",
+        "- пункт\n- пункт",
+        "1. пункт",
+        "строка с пробелом в конце  \nдальше",
+        "    отступ",
+        "\xa0\nпосле неразрывного пробела",
+        "<b>html</b> & [ссылка](http://example.com)",
+        "snake_case и `код`",
+        "строка\rдальше",
+        "абзац\r\n\r\nвторой **жирный\rперенос**",
+    ]
+
+    def test_matches_processed_corpus(self):
+        """Both tiers reproduce the HTML in records_processed.json."""
+        records = load_processed_records()
+        for fast_path in (True, False):
+            converter = MarkdownConverter(fast_path=fast_path)
+            for record in records:
+                self.assertEqual(converter.convert(record['content']), record['content_html'], record['id'])
+
+    def test_fast_path_matches_full_parser(self):
+        fast = MarkdownConverter(fast_path=True)
+        full = MarkdownConverter(fast_path=False)
+        texts = [record['content'] for record in load_processed_records()] + self.EDGE_CASES
+        for text in texts:
+            self.assertEqual(fast.convert(text), full.convert(text), repr(text))
+        self.assertGreater(fast.stats["fast_conversions"], len(texts) // 3)
+        self.assertEqual(full.stats["fast_conversions"], 0)
+
+    def test_parallel_conversion_uses_fast_path_in_process(self):
+        records = [{"id": "1", "content": "Просто **текст**"}, {"id": "2", "content": "# Заголовок"}]
+        converter = MarkdownConverter()
+        result = converter.convert_records_parallel(records, jobs=1)
+        self.assertEqual([r['content_html'] for r in result],
+                         ["<p>Просто <strong>текст</strong></p>", "<h1>Заголовок</h1>"])
+        self.assertEqual((converter.stats["conversions"], converter.stats["fast_conversions"]), (2, 1))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            MarkdownConverter(backend='pandoc')
+
+    @unittest.skipUnless(importlib.util.find_spec('markdown_it'), "markdown-it-py not installed")
+    def test_commonmark_backend_keeps_visible_text(self):
+        converter = MarkdownConverter(backend='commonmark')
+        self.assertEqual(converter.convert("Текст с **жирным**\nвторая строка\n\n----\nдальше"),
+                         "<p>Текст с <strong>жирным</strong><br />\nвторая строка</p>\n<hr />\n<p>дальше</p>")
+        for record in load_processed_records():
+            self.assertEqual(visible_text(converter.convert(record['content'])),
+                             visible_text(record['content_html']), record['id'])
+
+
+class TestMarkdownCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmpdir.name, 'markdown_cache.sqlite')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_rerun_hits_cache(self):
+        """A second run over unchanged content is served from disk."""
+        record = {"id": "1", "content": "Текст с **жирным**\n----\nдальше"}
+        with DiskCache(self.cache_path, table=MarkdownConverter.CACHE_TABLE) as cache:
+            expected = MarkdownConverter(cache=cache).convert_record(dict(record))["content_html"]
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+        with DiskCache(self.cache_path, table=MarkdownConverter.CACHE_TABLE) as cache:
+            converter = MarkdownConverter(cache=cache)
+            with patch.object(converter, 'convert', side_effect=AssertionError("re-parsed")):
+                result = converter.convert_record(dict(record))
+            self.assertEqual(result["content_html"], expected)
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+            self.assertEqual(cache.hit_ratio, 1.0)
+
+    def test_preprocess_version_invalidates(self):
+        with DiskCache(self.cache_path, table=MarkdownConverter.CACHE_TABLE) as cache:
+            MarkdownConverter(cache=cache).convert_cached("text")
+            with patch.object(MarkdownConverter, 'PREPROCESS_VERSION', MarkdownConverter.PREPROCESS_VERSION + 1):
+                MarkdownConverter(cache=cache).convert_cached("text")
+            self.assertEqual(cache.misses, 2)
+
+    def test_eviction_keeps_recent_entries(self):
+        with DiskCache(self.cache_path, table=MarkdownConverter.CACHE_TABLE, max_entries=2) as cache:
+            converter = MarkdownConverter(cache=cache)
+            for text in ("one", "two", "three"):
+                converter.convert_cached(text)
+        with DiskCache(self.cache_path, table=MarkdownConverter.CACHE_TABLE) as cache:
+            count = cache.connection.execute("SELECT COUNT(*) FROM markdown_html").fetchone()[0]
+            self.assertEqual(count, 2)
+
+    def test_tables_keep_entries_apart(self):
+        with DiskCache(self.cache_path, table='markdown_html') as markdown:
+            markdown.put('key', '<p>html</p>')
+            self.assertEqual(markdown.get('key'), '<p>html</p>')
+            self.assertEqual(markdown.stats, {"cache_hits": 1, "cache_misses": 0})
+        with DiskCache(self.cache_path, table='fit_results') as fit:
+            self.assertIsNone(fit.get('key'))
+            self.assertEqual(fit.stats, {"cache_hits": 0, "cache_misses": 1})
+        with self.assertRaises(ValueError):
+            DiskCache(self.cache_path, table='x; DROP TABLE markdown_html')
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
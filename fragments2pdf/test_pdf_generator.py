@@ -1,7 +1,14 @@
+import hashlib
+import json
+import re
 import unittest
 import os
-from pdf_generator import PDFGenerator
+import tempfile
+from fonts import font_name, pdf_font_files
+from pdf_generator import PDFGenerator, fit_key
+from text_fitter import TextFitter
 from reportlab.lib.pagesizes import A5, landscape
+from pypdf import PdfReader
 
 class TestPDFGenerator(unittest.TestCase):
     def setUp(self):
@@ -65,5 +72,217 @@ class TestPDFGenerator(unittest.TestCase):
         self.assertTrue(os.path.exists(self.test_output))
         self.assertGreater(os.path.getsize(self.test_output), 0)
 
+class TestTemplateFitting(unittest.TestCase):
+    def test_fitted_and_unfitted_pages(self):
+        """Server-fitted pages carry their size; others get a key for the browser fitter."""
+        template = PDFGenerator().template
+        records = [
+            {'title': 'A', 'sequence': 1, 'attribute1': ['x'], 'content_html': '<p>a</p>', 'content_font_size': 9.5},
+            {'title': 'B', 'sequence': 2, 'attribute1': ['x'], 'content_html': '<p>b</p>'},
+        ]
+        html = template.render(records=records)
+        self.assertIn(f'data-fit-key="{fit_key("<p>a</p>")}" style="font-size: 9.5pt;" data-fitted>', html)
+        self.assertIn(f'data-fit-key="{fit_key("<p>b</p>")}">', html)
+
+    def test_browser_sizes_keyed_by_template_version(self):
+        """Sizes the browser remembers are dropped when the template changes."""
+        generator = PDFGenerator()
+        with open('fragment.html.j2', encoding='utf-8') as f:
+            version = hashlib.sha1(f.read().encode('utf-8')).hexdigest()[:12]
+        html = generator.template.render(records=[])
+        self.assertIn(f"const FIT_STORAGE_PREFIX = 'fit:{version}:';", html)
+        self.assertIn("[minFontPt, maxFontPt, stepPt].join('-')", html)
+
+    def test_dedupe_emits_body_once(self):
+        """With dedupe, later attribute pages reference the first page's body and keep their marker."""
+        template = PDFGenerator().template
+        records = [{'title': 'A', 'sequence': 1, 'attribute1': ['x', 'y', 'z'], 'content_html': '<p>Уникальный текст</p>'}]
+        html = template.render(records=records, dedupe=True)
+
+        self.assertEqual(html.count('Уникальный текст'), 1)
+        self.assertEqual(html.count('class="page"'), 3)
+        self.assertIn('id="fragment-1"', html)
+        self.assertEqual(html.count('data-content-ref="fragment-1"'), 2)
+        pages = html.split('class="page"')[1:]
+        for page, attr in zip(pages, ['x', 'y', 'z']):
+            self.assertIn(f'<strong>{attr}</strong>', page)
+
+        self.assertEqual(template.render(records=records).count('Уникальный текст'), 3)
+
+    def test_streamed_html_matches_render(self):
+        """render_html streams the same document that template.render builds in memory."""
+        generator = PDFGenerator()
+        records = [
+            {'title': f'Заголовок {i}', 'sequence': i, 'attribute1': ['x', 'y'], 'content_html': f'<p>Текст {i}</p>'}
+            for i in range(20)
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'preview.html')
+            size = generator.render_html(records, path)
+            with open(path, encoding='utf-8') as f:
+                streamed = f.read()
+        self.assertEqual(streamed, generator.template.render(records=records))
+        self.assertEqual(size, len(streamed.encode('utf-8')))
+
+    def test_failed_render_keeps_previous_html(self):
+        """A render that fails halfway leaves the previous preview untouched."""
+        generator = PDFGenerator()
+        records = [{'title': f'Заголовок {i}', 'sequence': i, 'attribute1': ['x'], 'content_html': f'<p>Текст {i}</p>'}
+                   for i in range(3)]
+
+        def failing_records():
+            yield from records
+            raise RuntimeError("record error")
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'preview.html')
+            generator.render_html(records, path)
+            with self.assertRaises(RuntimeError):
+                generator.render_html(failing_records(), path)
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(f.read(), generator.template.render(records=records))
+            self.assertEqual(os.listdir(tmpdir), ['preview.html'])
+
+class TestChunkedPDF(unittest.TestCase):
+    def test_chunks_merge_in_order(self):
+        """Chunks rendered in worker processes are merged in record order with one page size."""
+        records = [
+            {'title': f'Title {i}', 'sequence': 100 + i, 'attribute1': ['Attr'],
+             'content_html': f'<p>Content {i}</p>', 'last_modified': '2025-04-30'}
+            for i in range(5)
+        ]
+        generator = PDFGenerator()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, 'fragments.pdf')
+            self.assertTrue(generator.generate_pdf(records, output_path, jobs=2, chunk_size=2))
+            pages = PdfReader(output_path).pages
+
+        self.assertEqual(len(pages), 5)
+        self.assertEqual(len({(page.mediabox.width, page.mediabox.height) for page in pages}), 1)
+        for i, page in enumerate(pages):
+            self.assertIn(f'Title {i}', page.extract_text())
+        self.assertEqual([t['pages'] for t in generator.chunk_timings], [2, 2, 1])
+        # Reported by the workers themselves, so it does not depend on when the pool is joined
+        self.assertGreater(generator.stats['worker_cpu_seconds'], 0)
+
+    def test_chunk_pages_share_embedded_fonts(self):
+        """Pages rendered in one chunk share its font objects, which keeps the PDF small."""
+        records = [
+            {'id': f'rec{i}', 'title': f'Заголовок {i}', 'sequence': i, 'attribute1': ['Семья', 'Работа'],
+             'content_html': f'<h2>Часть</h2><p>Текст фрагмента {i} <strong>жирный</strong> ' + 'слово ' * 50 + '</p>',
+             'last_modified': '2025-04-30'}
+            for i in range(30)
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, 'fragments.pdf')
+            self.assertTrue(PDFGenerator().generate_pdf(records, output_path, chunk_size=25))
+            pages = PdfReader(output_path).pages
+            fonts = {font.idnum for page in pages for font in page['/Resources']['/Font'].values()}
+            size = os.path.getsize(output_path)
+
+        self.assertEqual(len(pages), 60)
+        # Three chunks; a document per page embedded each font once per page (~45KB a page)
+        self.assertLessEqual(len(fonts), 3 * 3)
+        self.assertLess(size, 300_000)
+
+    def test_incremental_rebuild_rerenders_only_changed_pages(self):
+        records = [
+            {'id': f'rec{i}', 'title': f'Title {i}', 'sequence': 100 + i, 'attribute1': ['A', 'B'] if i == 1 else ['A'],
+             'content_html': f'<p>Content {i}</p>', 'last_modified': '2025-04-30'}
+            for i in range(3)
+        ]
+        generator = PDFGenerator()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, 'fragments.pdf')
+            self.assertTrue(generator.generate_pdf(records, output_path))
+            self.assertEqual(generator.last_build, {"rendered": 4, "reused": 0})
+
+            records[2] = dict(records[2], content_html='<p>Edited</p>')
+            self.assertTrue(generator.generate_pdf(records, output_path))
+            self.assertEqual(generator.last_build, {"rendered": 1, "reused": 3})
+
+            # Reordering only splices existing pages
+            records.reverse()
+            self.assertTrue(generator.generate_pdf(records, output_path))
+            self.assertEqual(generator.last_build, {"rendered": 0, "reused": 4})
+            texts = [page.extract_text() for page in PdfReader(output_path).pages]
+
+        self.assertEqual(len(texts), 4)
+        self.assertIn('Edited', texts[0])
+        self.assertIn('Title 1', texts[1])
+        self.assertIn('Title 1', texts[2])
+        self.assertIn('Content 0', texts[3])
+
+    @unittest.skipUnless(pdf_font_files()[0], "no PDF font file available")
+    def test_cyrillic_drawn_with_embedded_font_subset(self):
+        records = [{'id': 'rec1', 'title': 'Детство', 'sequence': 1, 'attribute1': ['Семья'],
+                    'content_html': '<p>Текст <strong>фрагмента</strong></p>', 'last_modified': '2025-04-30'}]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, 'fragments.pdf')
+            self.assertTrue(PDFGenerator().generate_pdf(records, output_path))
+            page = PdfReader(output_path).pages[0]
+            fonts = {font.get_object()['/BaseFont'] for font in page['/Resources']['/Font'].values()}
+            text = page.extract_text()
+
+        self.assertIn('Текст фрагмента', text)
+        regular, bold = (font_name(path) for path in pdf_font_files())
+        # Embedded subsets are named with a six-letter tag, e.g. /AAAAAA+DejaVuSans
+        subsets = {font.split('+', 1)[1] for font in fonts if re.match(r'/[A-Z]{6}\+', font)}
+        self.assertEqual(subsets, {regular, bold})
+
+    def test_single_page_rule_in_pdf_mode(self):
+        """The PDF template defines one @page, so xhtml2pdf does not warn about a redefined page template."""
+        records = [{'id': 'rec1', 'title': 'Детство', 'sequence': 1, 'attribute1': ['Семья', 'Работа'],
+                    'content_html': '<p>Текст</p>', 'last_modified': '2025-04-30'}]
+        with tempfile.TemporaryDirectory() as tmpdir, self.assertLogs('xhtml2pdf', level='DEBUG') as logs:
+            self.assertTrue(PDFGenerator().generate_pdf(records, os.path.join(tmpdir, 'fragments.pdf')))
+            self.assertEqual(len(PdfReader(os.path.join(tmpdir, 'fragments.pdf')).pages), 2)
+        self.assertFalse([line for line in logs.output if 'already been defined' in line])
+
+    def test_fitted_content_stays_on_one_page(self):
+        """Content fitted (or truncated) to the content box fills exactly one PDF page per unit."""
+        fitter = TextFitter()
+        records = []
+        for i, repeat in enumerate([20, 40, 60]):
+            html = ''.join(f'<p>Абзац {j} ' + 'длинный текст фрагмента ' * repeat + '</p>' for j in range(6))
+            fitted = fitter.fit(html)
+            records.append({'id': f'rec{i}', 'title': 'Длинный заголовок ' * (i + 1), 'sequence': i,
+                            'attribute1': ['Семья', 'Работа', 'Детство'][:i + 1],
+                            'content_html': fitted['html'] or html, 'content_font_size': fitted['font_size'],
+                            'last_modified': '2025-04-30'})
+        self.assertGreater(fitter.stats['truncated'], 0)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            output_path = os.path.join(tmpdir, 'fragments.pdf')
+            self.assertTrue(PDFGenerator().generate_pdf(records, output_path))
+            texts = [page.extract_text() for page in PdfReader(output_path).pages]
+
+        self.assertEqual(len(texts), 6)
+        for text in texts:
+            self.assertIn('2025-04-30', text)
+
+
+class TestShards(unittest.TestCase):
+    def test_one_shard_per_attribute(self):
+        """Each section gets its own PDF with that attribute's pages; unchanged shards are kept."""
+        records = [
+            {'id': f'rec{i}', 'title': f'Title {i}', 'sequence': i, 'attribute1': attrs,
+             'content_html': f'<p>Content {i}</p>', 'last_modified': '2025-04-30'}
+            for i, attrs in enumerate([['Детство'], ['Детство', 'Работа'], ['Работа']])
+        ]
+        generator = PDFGenerator()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            index_path = generator.generate_shards(records, tmpdir, pdf=True, jobs=2)
+            with open(index_path, encoding='utf-8') as f:
+                shards = json.load(f)["shards"]
+            self.assertEqual([(s["section"], s["file"], s["records"], s["pages"]) for s in shards],
+                             [('Детство', '001_Детство.pdf', 2, 2), ('Работа', '002_Работа.pdf', 2, 2)])
+            texts = [page.extract_text() for page in PdfReader(os.path.join(tmpdir, shards[1]["file"])).pages]
+            self.assertIn('Title 1', texts[0])
+            self.assertIn('Title 2', texts[1])
+
+            records[2] = dict(records[2], content_html='<p>Edited</p>')
+            generator.generate_shards(records, tmpdir, pdf=True)
+            self.assertEqual(generator.stats["shards_rendered"], 1)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,90 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from fragment import Fragment
+from pipeline import JsonArrayWriter, SnapshotWriter, batched, prefetch, read_snapshot, snapshot_filters, snapshot_path
+
+
+class TestPipeline(unittest.TestCase):
+    def test_prefetch_keeps_order(self):
+        self.assertEqual(list(prefetch(range(50), 3)), list(range(50)))
+
+    def test_prefetch_reraises_producer_error(self):
+        def failing():
+            yield 1
+            raise ValueError("Airtable error")
+
+        with self.assertRaisesRegex(ValueError, "Airtable error"):
+            list(prefetch(failing(), 2))
+
+    def test_batched(self):
+        self.assertEqual(list(batched(range(5), 2)), [[0, 1], [2, 3], [4]])
+
+    def test_json_writer_matches_json_dump(self):
+        items = [{"title": "Фрагмент", "attribute1": ["a", "b"], "last_modified": datetime(2025, 4, 30)},
+                 {"content": "line\nbreak", "nested": {"x": []}}]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for count in (0, 1, 2):
+                path = os.path.join(tmpdir, f"{count}.json")
+                with JsonArrayWriter(path) as writer:
+                    for item in items[:count]:
+                        writer.write(item)
+                with open(path, encoding='utf-8') as f:
+                    expected = json.dumps(items[:count], indent=2, ensure_ascii=False, default=str)
+                    self.assertEqual(f.read(), expected)
+
+    def test_snapshot_round_trip(self):
+        records = [
+            Fragment.from_dict({'id': f'rec{i}', 'title': 'Фрагмент', 'sequence': i, 'attribute1': ['a', 'b'],
+                                'content': 'line\nbreak', 'last_modified': datetime(2025, 4, 30, 7, i, tzinfo=timezone.utc)})
+            for i in range(3)
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'snapshot.jsonl')
+            with SnapshotWriter(path) as writer:
+                for record in records:
+                    writer.write(record)
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(len(f.read().splitlines()), 4)
+            self.assertEqual(list(read_snapshot(path)), records)
+            self.assertEqual(snapshot_filters(path), {})
+
+            # A failed run keeps the previous snapshot
+            with self.assertRaises(RuntimeError), SnapshotWriter(path) as writer:
+                writer.write(records[0])
+                raise RuntimeError("Airtable error")
+            self.assertEqual(len(list(read_snapshot(path))), 3)
+            self.assertEqual(os.listdir(tmpdir), ['snapshot.jsonl'])
+
+    def test_snapshot_records_filters(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'snapshot.jsonl')
+            with SnapshotWriter(path, filters={"fragment_ids": {3, 1}, "attributes": ["Работа"],
+                                               "modified_since": datetime(2025, 4, 1), "query": None}) as writer:
+                writer.write({'id': 'rec1', 'title': 'Фрагмент', 'sequence': 1, 'attribute1': ['a'], 'content': 'Текст'})
+            self.assertEqual(snapshot_filters(path), {"fragment_ids": [1, 3], "attributes": ["Работа"],
+                                                      "modified_since": "2025-04-01 00:00:00"})
+            self.assertEqual(len(list(read_snapshot(path))), 1)
+
+    def test_empty_run_keeps_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'snapshot.jsonl')
+            with SnapshotWriter(path) as writer:
+                writer.write({'id': 'rec1', 'title': 'Фрагмент', 'sequence': 1, 'attribute1': ['a'], 'content': 'Текст'})
+            with SnapshotWriter(path):
+                pass
+            self.assertEqual(len(list(read_snapshot(path))), 1)
+            self.assertEqual(os.listdir(tmpdir), ['snapshot.jsonl'])
+
+    def test_filtered_snapshot_path(self):
+        path = os.path.join('output', 'snapshot.jsonl')
+        self.assertEqual(snapshot_path(path, {"fragment_ids": None, "attributes": []}), path)
+        filtered = snapshot_path(path, {"fragment_ids": {3, 1}})
+        self.assertRegex(filtered, r'^output/snapshot\.[0-9a-f]{10}\.jsonl$')
+        self.assertEqual(filtered, snapshot_path(path, {"fragment_ids": {1, 3}, "attributes": None}))
+        self.assertNotEqual(filtered, snapshot_path(path, {"fragment_ids": {1}}))
+
+if __name__ == '__main__':
+    unittest.main()
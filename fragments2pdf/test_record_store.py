@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from record_store import RecordStore
+
+
+def make_record(record_id, sequence, modified):
+    return {
+        'id': record_id,
+        'title': f'Title {sequence}',
+        'sequence': sequence,
+        'attribute1': ['Attr'],
+        'content': f'Content {sequence}',
+        'last_modified': datetime(2025, 4, modified, tzinfo=timezone.utc),
+    }
+
+
+class TestRecordStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = RecordStore(os.path.join(self.tmpdir.name, 'output', 'records.sqlite'))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_empty_store(self):
+        self.assertIsNone(self.store.high_water_mark())
+        self.assertEqual(self.store.get_records(), [])
+
+    def test_upsert_order_and_delete(self):
+        self.store.upsert(make_record('rec1', 1, 10), ['first'])
+        self.store.upsert(make_record('rec2', 2, 20), [])
+        self.store.upsert(make_record('rec1', 1, 15), ['updated', 'second'])
+        self.store.set_order(['rec2', 'rec1'])
+
+        records = self.store.get_records()
+        self.assertEqual([record['id'] for record, _ in records], ['rec2', 'rec1'])
+        self.assertEqual(records[1][1], ['updated', 'second'])
+        self.assertEqual(self.store.high_water_mark(), datetime(2025, 4, 20, tzinfo=timezone.utc))
+
+        self.store.delete({'rec2'})
+        self.assertEqual(self.store.record_ids(), {'rec1'})
+
+    def test_filters(self):
+        self.store.upsert(make_record('rec1', 1, 10), [])
+        self.store.upsert(make_record('rec2', 2, 20), [])
+        self.assertEqual([r['id'] for r, _ in self.store.get_records(fragment_ids={2})], ['rec2'])
+        self.assertEqual([r['id'] for r, _ in self.store.get_records(modified_since=datetime(2025, 4, 15))], ['rec2'])
+
+    def test_full_text_and_attribute_index(self):
+        self.store.upsert(dict(make_record('rec1', 1, 10), title='Детство', attribute1=['Семья', 'Школа'],
+                               content='Ёлка и **креативность**'), ['Почему ёлка?'])
+        self.store.upsert(dict(make_record('rec2', 2, 20), attribute1=['Работа'],
+                               content='Креативные подходы на работе'), [])
+        self.store.upsert(dict(make_record('rec3', 3, 20), attribute1=['Школа']), ['Про семью'])
+        self.store.set_order(['rec3', 'rec2', 'rec1'])
+
+        def select(**filters):
+            return [record['id'] for record, _ in self.store.get_records(**filters)]
+
+        self.assertEqual(select(query='креатив*'), ['rec2', 'rec1'])
+        self.assertEqual(select(query='елка'), ['rec1'])
+        self.assertEqual(select(query='title:детство'), ['rec1'])
+        self.assertEqual(select(query='семь*'), ['rec3', 'rec1'])
+        self.assertEqual(select(query='почему'), ['rec1'])
+        self.assertEqual(select(attributes=['Школа']), ['rec3', 'rec1'])
+        self.assertEqual(select(query='креатив*', attributes=['Школа']), ['rec1'])
+        with self.assertRaises(ValueError):
+            select(query='"unterminated')
+
+        # Updates and deletions keep the index in step
+        self.store.upsert(dict(make_record('rec2', 2, 21), attribute1=['Школа']), [])
+        self.store.delete({'rec1'})
+        self.assertEqual(select(query='креатив*'), [])
+        self.assertEqual(select(attributes=['Школа']), ['rec3', 'rec2'])
+
+    def test_index_built_for_existing_store(self):
+        self.store.upsert(dict(make_record('rec1', 1, 10), content='Креативность'), [])
+        with self.store.connection:
+            self.store.connection.execute("DELETE FROM records_fts")
+        self.store.close()
+        self.store = RecordStore(os.path.join(self.tmpdir.name, 'output', 'records.sqlite'))
+        self.assertEqual(self.store.search(query='креативность'), {'rec1'})
+
+if __name__ == '__main__':
+    unittest.main()
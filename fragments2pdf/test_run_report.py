@@ -0,0 +1,51 @@
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from run_report import RunReport
+
+
+class TestRunReport(unittest.TestCase):
+    def test_stage_measurements_and_json(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            report = RunReport(profile_dir=tmpdir)
+            with report.stage("convert") as stage:
+                sum(i * i for i in range(100000))
+                stage['items'] = 3
+            report.add("airtable", {"http_requests": 5, "http_retries": 1})
+
+            path = os.path.join(tmpdir, 'run_report.json')
+            report.write(path, success=True)
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, 'profile_convert.prof')))
+
+        stage = data['stages']['convert']
+        self.assertEqual(stage['items'], 3)
+        self.assertGreater(stage['wall_seconds'], 0)
+        self.assertGreater(stage['cpu_seconds'], 0)
+        self.assertIn('process_peak_rss_mb', stage)
+        self.assertGreaterEqual(stage['rss_growth_mb'], 0)
+        self.assertEqual(stage['worker_cpu_seconds'], 0.0)
+        self.assertEqual(data['airtable']['http_retries'], 1)
+        self.assertTrue(data['success'])
+
+    def test_profile_includes_threads_started_in_stage(self):
+        """Work done by producer and worker threads shows up in the stage's profile."""
+        def fetch_in_thread(n):
+            return sum(i * i for i in range(n))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            report = RunReport(profile_dir=tmpdir)
+            with report.stage("fetch_and_convert"):
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    list(executor.map(fetch_in_thread, [1000] * 4))
+            stats = pstats.Stats(os.path.join(tmpdir, 'profile_fetch_and_convert.prof'))
+
+        calls = {function[2]: stat[1] for function, stat in stats.stats.items()}
+        self.assertEqual(calls['fetch_in_thread'], 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Cold `import main` took ~1.4s when it loaded xhtml2pdf and pyairtable up front
+IMPORT_BUDGET_SECONDS = 0.5
+
+
+def run_python(code):
+    result = subprocess.run([sys.executable, '-c', code], cwd=HERE, capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_main_within_budget(self):
+        # Best of three, to keep the check stable on a busy machine
+        timings = [float(run_python(
+            "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+        )[-1]) for _ in range(3)]
+        self.assertLess(min(timings), IMPORT_BUDGET_SECONDS)
+
+    def test_html_path_does_not_load_pdf_libraries(self):
+        loaded = run_python(
+            "import os, sys, tempfile\n"
+            "import main\n"
+            "from markdown_converter import MarkdownConverter\n"
+            "from pdf_generator import PDFGenerator\n"
+            "record = MarkdownConverter().convert_record({'title': 'T', 'sequence': 1, 'attribute1': ['a'],"
+            " 'content': '**Текст**'})\n"
+            "with tempfile.TemporaryDirectory() as tmpdir:\n"
+            "    PDFGenerator().render_html([record], os.path.join(tmpdir, 'preview.html'))\n"
+            "print(*sorted(m for m in ('xhtml2pdf', 'reportlab', 'pyairtable') if m in sys.modules))"
+        )
+        self.assertEqual(loaded, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
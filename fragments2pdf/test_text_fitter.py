@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from disk_cache import DiskCache
+from markdown_converter import MarkdownConverter
+from text_fitter import TextFitter, _BlockParser, truncate_html
+
+PARAGRAPH = "Было предложение от наших администраторов вместе с официантами, они придумали вечер. "
+
+
+class TestTextFitter(unittest.TestCase):
+    def setUp(self):
+        self.fitter = TextFitter()
+        self.converter = MarkdownConverter()
+
+    def fit(self, text):
+        return self.fitter.fit(self.converter.convert(text))
+
+    def blocks(self, text):
+        parser = _BlockParser()
+        parser.feed(self.converter.convert(text))
+        return parser.blocks
+
+    def test_short_text_uses_max_size(self):
+        self.assertEqual(self.fit("Короткий **текст**"), {"font_size": 11, "html": None, "dropped": 0})
+
+    def test_long_text_shrinks(self):
+        text = "\n\n".join([PARAGRAPH * 4] * 9)
+        result = self.fit(text)
+        self.assertLess(result["font_size"], 11)
+        self.assertGreaterEqual(result["font_size"], 7)
+        self.assertIsNone(result["html"])
+        # The fitted size is the largest one in 0.05pt steps
+        self.assertTrue(self.fitter._fits(self.blocks(text), result["font_size"]))
+        self.assertFalse(self.fitter._fits(self.blocks(text), result["font_size"] + 0.05))
+
+    def test_overflow_is_truncated_with_count(self):
+        result = self.fit("\n\n".join(["**" + PARAGRAPH + "**" + PARAGRAPH * 5] * 20))
+        self.assertEqual(result["font_size"], 7)
+        self.assertGreater(result["dropped"], 0)
+        self.assertIn(f'(+{result["dropped"]} characters)', result["html"])
+        self.assertTrue(result["html"].endswith("</p>"))
+        self.assertEqual(result["html"].count("<strong>"), result["html"].count("</strong>"))
+
+    def test_fit_record(self):
+        record = self.fitter.fit_record({"content_html": "<p>текст</p>"})
+        self.assertEqual(record["content_font_size"], 11)
+        self.assertEqual(record["content_truncated"], 0)
+
+    def test_fit_is_cached(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with DiskCache(os.path.join(tmpdir, 'fit_cache.sqlite'), table=TextFitter.CACHE_TABLE) as cache:
+                fitter = TextFitter(cache=cache)
+                first = fitter.fit("<p>" + PARAGRAPH * 30 + "</p>")
+                with patch.object(fitter, '_layout', side_effect=AssertionError("re-measured")):
+                    self.assertEqual(fitter.fit("<p>" + PARAGRAPH * 30 + "</p>"), first)
+                self.assertEqual(cache.hits, 1)
+
+
+class TestTruncateHtml(unittest.TestCase):
+    def test_closes_open_tags(self):
+        result = truncate_html("<p>one <strong>two three</strong></p><p>four</p>", 8, "…")
+        self.assertEqual(result, "<p>one <strong>two th…</strong></p>")
+
+if __name__ == '__main__':
+    unittest.main()
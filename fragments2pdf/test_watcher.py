@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from urllib.request import urlopen
+from config import Config
+from airtable_client import AirtableClient
+from airtable_standin import AirtableStandIn, records_from_clean_json
+from markdown_converter import MarkdownConverter
+from pdf_generator import PDFGenerator
+from watcher import PreviewWatcher
+
+CLEAN_RECORDS = [
+    {
+        'id': f'rec{i:014d}',
+        'title': f'Фрагмент {i}',
+        'sequence': i,
+        'attribute1': ['Атрибут'],
+        'content': f'Текст {i}',
+        'last_modified': '2025-04-30 07:18:59+00:00',
+    }
+    for i in range(1, 4)
+]
+
+
+class TestPreviewWatcher(unittest.TestCase):
+    def test_polls_changes_and_serves_versioned_preview(self):
+        records, comments = records_from_clean_json(CLEAN_RECORDS)
+        with AirtableStandIn(records, comments) as standin, tempfile.TemporaryDirectory() as tmpdir, \
+                patch.multiple(Config, AIRTABLE_API_KEY='key', AIRTABLE_BASE_ID='app', AIRTABLE_TABLE_ID='tbl',
+                               AIRTABLE_ENDPOINT_URL=standin.endpoint_url, AIRTABLE_REQUESTS_PER_SECOND=0):
+            converter = MarkdownConverter()
+            watcher = PreviewWatcher(AirtableClient(), converter, PDFGenerator(), tmpdir)
+            self.assertEqual(watcher.load(), 3)
+            url = watcher.serve(port=0)
+            try:
+                self.assertEqual(urlopen(url.replace('preview.html', '__version')).read(), b'1')
+
+                # Nothing changed: no reconversion, no re-render
+                conversions = converter.stats["conversions"]
+                self.assertEqual(watcher.poll(), {"updated": 0, "deleted": 0})
+                self.assertEqual((watcher.version, converter.stats["conversions"]), (1, conversions))
+
+                records[1]['fields'][Config.FIELD_CONTENT] = 'Исправленный текст'
+                records[1]['fields'][Config.FIELD_LAST_MODIFIED] = '2025-05-01T08:00:00.000Z'
+                del records[2]
+                self.assertEqual(watcher.poll(), {"updated": 1, "deleted": 1})
+                self.assertEqual(converter.stats["conversions"], conversions + 1)
+
+                html = urlopen(url).read().decode('utf-8')
+                self.assertIn('Исправленный текст', html)
+                self.assertNotIn('Фрагмент 3', html)
+                self.assertIn("})('2');", html)
+                self.assertEqual(urlopen(url.replace('preview.html', '__version')).read(), b'2')
+            finally:
+                watcher.stop()
+
+    def test_failed_render_keeps_version(self):
+        """The served version only changes once a new preview has been written."""
+        generator = MagicMock()
+        generator.generate_preview.return_value = None
+        with tempfile.TemporaryDirectory() as tmpdir:
+            watcher = PreviewWatcher(MagicMock(), MarkdownConverter(), generator, tmpdir)
+            with self.assertRaises(RuntimeError):
+                watcher.render()
+            self.assertEqual(watcher.version, 0)
+
+            generator.generate_preview.return_value = os.path.join(tmpdir, 'preview.html')
+            watcher.render()
+            self.assertEqual(watcher.version, 1)
+            self.assertEqual(generator.generate_preview.call_args.kwargs['live_reload'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,356 @@
+import html
+import json
+import time
+from html.parser import HTMLParser
+from config import Config
+from fonts import FontMetrics, find_font_file, font_name
+
+PT_PER_MM = 72 / 25.4
+
+BLOCK_TAGS = {'p', 'div', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'hr', 'tr'}
+BOLD_TAGS = {'strong', 'b', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'th'}
+LIST_TAGS = {'ul', 'ol'}
+VOID_TAGS = {'br', 'hr', 'img', 'meta', 'link', 'input', 'col', 'area', 'base', 'wbr'}
+# Relative font sizes of headings inside .content (browser defaults)
+HEADING_SCALE = {'h1': 2.0, 'h2': 1.5, 'h3': 1.17, 'h4': 1.0, 'h5': 0.83, 'h6': 0.67}
+# List items are indented by the browser's default 40px padding
+LIST_INDENT_PT = 30
+
+
+class _Block:
+    def __init__(self, tag, indent):
+        self.tag = tag
+        self.indent = indent
+        # Hard lines (split by <br>), each a list of (word, bold) tuples
+        self.lines = [[]]
+
+    @property
+    def scale(self):
+        return HEADING_SCALE.get(self.tag, 1.0)
+
+    @property
+    def has_margin(self):
+        # Paragraphs and headings get 1em margins, list items and divs don't
+        return self.tag not in ('li', 'div', 'tr')
+
+    def char_count(self):
+        return sum(len(word) for line in self.lines for word, _ in line)
+
+
+class _BlockParser(HTMLParser):
+    """Split converted HTML into blocks of words, keeping track of bold runs."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self.bold_depth = 0
+        self.list_depth = 0
+        self.current = None
+
+    def _block(self):
+        if self.current is None:
+            self.current = _Block('p', self.list_depth * LIST_INDENT_PT)
+            self.blocks.append(self.current)
+        return self.current
+
+    def handle_starttag(self, tag, attrs):
+        if tag in LIST_TAGS:
+            self.list_depth += 1
+            self.current = None
+        elif tag in BLOCK_TAGS:
+            self.current = _Block(tag, self.list_depth * LIST_INDENT_PT)
+            self.blocks.append(self.current)
+            if tag == 'hr':
+                self.current = None
+        elif tag == 'br':
+            self._block().lines.append([])
+        if tag in BOLD_TAGS:
+            self.bold_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in BOLD_TAGS:
+            self.bold_depth -= 1
+
+    def handle_endtag(self, tag):
+        if tag in BOLD_TAGS:
+            self.bold_depth = max(0, self.bold_depth - 1)
+        if tag in LIST_TAGS:
+            self.list_depth = max(0, self.list_depth - 1)
+            self.current = None
+        elif tag in BLOCK_TAGS:
+            self.current = None
+
+    def handle_data(self, data):
+        words = data.split()
+        if words:
+            line = self._block().lines[-1]
+            line.extend((word, self.bold_depth > 0) for word in words)
+
+
+class _Truncator(HTMLParser):
+    """Re-emit HTML up to a budget of non-whitespace characters, then close open tags."""
+
+    def __init__(self, keep_chars, suffix):
+        super().__init__(convert_charrefs=True)
+        self.remaining = keep_chars
+        self.suffix = suffix
+        self.parts = []
+        self.open_tags = []
+        self.done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        self.parts.append(self.get_starttag_text())
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if not self.done:
+            self.parts.append(self.get_starttag_text())
+
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        self.parts.append(f"</{tag}>")
+        if tag in self.open_tags:
+            del self.open_tags[len(self.open_tags) - 1 - self.open_tags[::-1].index(tag):]
+
+    def handle_data(self, data):
+        if self.done:
+            return
+        visible = len(data) - sum(1 for c in data if c.isspace())
+        if visible <= self.remaining:
+            self.remaining -= visible
+            self.parts.append(html.escape(data, quote=False))
+            return
+
+        cut = 0
+        for cut, c in enumerate(data):
+            if not c.isspace():
+                if self.remaining == 0:
+                    break
+                self.remaining -= 1
+        self.parts.append(html.escape(data[:cut].rstrip(), quote=False))
+        self.finish()
+
+    def finish(self):
+        if self.done:
+            return
+        self.parts.append(self.suffix)
+        self.parts.extend(f"</{tag}>" for tag in reversed(self.open_tags))
+        self.done = True
+
+    def result(self):
+        self.close()
+        self.finish()
+        return "".join(self.parts)
+
+
+def truncate_html(content_html, keep_chars, suffix):
+    """
+    Cut HTML after keep_chars non-whitespace characters of text and append suffix.
+
+    Args:
+        content_html (str): HTML to truncate
+        keep_chars (int): Number of visible characters to keep
+        suffix (str): HTML inserted at the cut, inside the innermost open element
+
+    Returns:
+        str: Well-formed truncated HTML
+    """
+    truncator = _Truncator(keep_chars, suffix)
+    truncator.feed(content_html)
+    return truncator.result()
+
+
+class TextFitter:
+    # Bump when the layout model changes, so cached fits are invalidated
+    FIT_VERSION = 1
+
+    # Table of the DiskCache holding fit results
+    CACHE_TABLE = 'fit_results'
+
+    def __init__(self, cache=None):
+        """
+        Initialize the fitter with the .content box geometry and font metrics.
+
+        Text is measured with the first available font from Config.CONTENT_FONT_FILES
+        (falling back to reportlab's built-in Helvetica metrics). Font metrics are
+        only loaded on the first measurement, from the font cache when the TTF has
+        been parsed before, so fully cached runs never load reportlab.
+
+        Args:
+            cache (DiskCache, optional): Persistent cache of fit results
+        """
+        self.cache = cache
+        self.width = Config.CONTENT_BOX_WIDTH * PT_PER_MM
+        self.height = Config.CONTENT_BOX_HEIGHT * PT_PER_MM
+        self.line_height = Config.CONTENT_LINE_HEIGHT
+        self.min_size = Config.FIT_MIN_FONT_SIZE
+        self.max_size = Config.FIT_MAX_FONT_SIZE
+
+        regular_path = find_font_file(Config.CONTENT_FONT_FILES)
+        bold_path = find_font_file(Config.CONTENT_BOLD_FONT_FILES)
+        self._font_files = {font_name(path): path for path in (regular_path, bold_path) if path}
+        self.font_name = font_name(regular_path) if regular_path else 'Helvetica'
+        if bold_path:
+            self.bold_font_name = font_name(bold_path)
+        else:
+            self.bold_font_name = 'Helvetica-Bold' if self.font_name == 'Helvetica' else self.font_name
+        self._string_width = None
+        self._word_widths = {}
+        self.stats = {"fits": 0, "measured": 0, "truncated": 0, "fit_seconds": 0.0}
+
+    def _load_metrics(self):
+        if not self._font_files:
+            from reportlab.pdfbase import pdfmetrics
+
+            self._string_width = pdfmetrics.stringWidth
+            return
+        metrics = {name: FontMetrics.load(path) for name, path in self._font_files.items()}
+        self._string_width = lambda text, name, size: metrics[name].string_width(text, size)
+
+    def _width(self, word, bold):
+        """Width of a word at 1pt; widths scale linearly with font size."""
+        key = (word, bold)
+        width = self._word_widths.get(key)
+        if width is None:
+            if self._string_width is None:
+                self._load_metrics()
+            width = self._string_width(word, self.bold_font_name if bold else self.font_name, 1)
+            self._word_widths[key] = width
+        return width
+
+    def _wrap(self, block, size):
+        """
+        Yields:
+            int: Visible character count of each rendered line of the block
+        """
+        size = size * block.scale
+        available = (self.width - block.indent) / size
+        space = self._width(' ', False)
+        for hard_line in block.lines:
+            used = 0.0
+            chars = 0
+            for word, bold in hard_line:
+                width = self._width(word, bold)
+                if chars and used + space + width > available:
+                    yield chars
+                    used, chars = 0.0, 0
+                used += (space if chars else 0) + width
+                chars += len(word)
+            yield chars
+
+    def _layout(self, blocks, size):
+        """
+        Lay out blocks at a font size.
+
+        Returns:
+            list: (bottom edge in pt, visible characters) for each line, in order
+        """
+        lines = []
+        y = 0.0
+        previous_margin = 0.0
+        for block in blocks:
+            margin = size * block.scale if block.has_margin else 0.0
+            y += max(previous_margin, margin) if lines else margin
+            line_height = size * block.scale * self.line_height
+            for chars in self._wrap(block, size):
+                y += line_height
+                lines.append((y, chars))
+            previous_margin = margin
+        return lines, y + previous_margin
+
+    def _fits(self, blocks, size):
+        _, height = self._layout(blocks, size)
+        return height <= self.height
+
+    def fit(self, content_html):
+        """
+        Find the largest font size that fits content_html into the .content box.
+
+        Binary-searches between FIT_MIN_FONT_SIZE and FIT_MAX_FONT_SIZE in 0.05pt
+        steps. When even the minimum size overflows, the HTML is truncated with an
+        ellipsis and the number of dropped (non-whitespace) characters.
+
+        Args:
+            content_html (str): Converted fragment HTML
+
+        Returns:
+            dict: font_size (float), html (truncated HTML or None) and dropped (int)
+        """
+        if not content_html:
+            return {"font_size": self.max_size, "html": None, "dropped": 0}
+
+        start = time.perf_counter()
+        self.stats["fits"] += 1
+        try:
+            return self._fit(content_html)
+        finally:
+            self.stats["fit_seconds"] += time.perf_counter() - start
+
+    def _fit(self, content_html):
+
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(content_html, 'fit', self.FIT_VERSION, self.font_name, self.bold_font_name,
+                                      self.width, self.height, self.line_height, self.min_size, self.max_size)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return json.loads(cached)
+
+        self.stats["measured"] += 1
+        parser = _BlockParser()
+        parser.feed(content_html)
+        parser.close()
+        blocks = parser.blocks
+
+        if self._fits(blocks, self.max_size):
+            result = {"font_size": self.max_size, "html": None, "dropped": 0}
+        elif not self._fits(blocks, self.min_size):
+            result = self._truncate(content_html, blocks)
+            self.stats["truncated"] += 1
+        else:
+            low, high = round(self.min_size * 20), round(self.max_size * 20)
+            # Invariant: low fits, high does not
+            while high - low > 1:
+                middle = (low + high) // 2
+                if self._fits(blocks, middle / 20):
+                    low = middle
+                else:
+                    high = middle
+            result = {"font_size": low / 20, "html": None, "dropped": 0}
+
+        if key is not None:
+            self.cache.put(key, json.dumps(result, ensure_ascii=False))
+        return result
+
+    def _truncate(self, content_html, blocks):
+        size = self.min_size
+        lines, _ = self._layout(blocks, size)
+        # Leave one line (and the closing margin) for the truncation marker
+        limit = self.height - size * (1 + self.line_height)
+        kept = sum(chars for bottom, chars in lines if bottom <= limit)
+        dropped = sum(block.char_count() for block in blocks) - kept
+        suffix = f'…&nbsp;<span class="truncated">(+{dropped} characters)</span>'
+        return {"font_size": size, "html": truncate_html(content_html, kept, suffix), "dropped": dropped}
+
+    def fit_record(self, record: dict) -> dict:
+        """
+        Fit a converted record, setting content_font_size and content_truncated.
+
+        Args:
+            record (Fragment or dict): Record with content_html
+
+        Returns:
+            dict: Record with fitted (and possibly truncated) content_html
+        """
+        if 'content_html' in record:
+            result = self.fit(record['content_html'])
+            record['content_font_size'] = result['font_size']
+            record['content_truncated'] = result['dropped']
+            if result['html'] is not None:
+                record['content_html'] = result['html']
+        return record
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from datetime import timedelta
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _PreviewHandler(SimpleHTTPRequestHandler):
+    server_version = "FragmentsPreview"
+    watcher = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/__version':
+            body = str(self.watcher.version).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Cache-Control', 'no-store')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if self.path in ('', '/'):
+            self.path = '/preview.html'
+        super().do_GET()
+
+
+class PreviewWatcher:
+    def __init__(self, airtable_client, markdown_converter, pdf_generator, output_dir, text_fitter=None,
+                 fragment_ids=None, attributes=None, dedupe=False):
+        """
+        Keep the preview up to date with Airtable in a long-running process.
+
+        Converted records, the converter (with its cache) and the compiled
+        template stay in memory. Each poll asks Airtable only for records
+        modified since the newest one seen, plus the ID-only listing to notice
+        deletions and reordering; only changed records are reconverted before
+        the preview is re-rendered.
+
+        Args:
+            airtable_client (AirtableClient): Client used for polling
+            markdown_converter (MarkdownConverter): Converter, ideally with a cache
+            pdf_generator (PDFGenerator): Renders preview.html
+            output_dir (str): Directory preview.html is written to and served from
+            text_fitter (TextFitter, optional): Fits content server-side when given
+            fragment_ids (set, optional): Only watch records with these sequence IDs
+            attributes (list, optional): Only watch records tagged with these attributes
+            dedupe (bool): Emit each fragment body once in the preview
+        """
+        self.airtable_client = airtable_client
+        self.markdown_converter = markdown_converter
+        self.pdf_generator = pdf_generator
+        self.text_fitter = text_fitter
+        self.output_dir = output_dir
+        self.filters = {"fragment_ids": fragment_ids, "attributes": attributes}
+        self.dedupe = dedupe
+        self.records = {}
+        self.order = []
+        self.high_water = None
+        self.version = 0
+        self._server = None
+
+    def _process(self, record):
+        record = self.markdown_converter.convert_record(record)
+        if self.text_fitter:
+            record = self.text_fitter.fit_record(record)
+        return record
+
+    def _update(self, records):
+        for record in records:
+            self.records[record['id']] = self._process(record)
+            if self.high_water is None or record['last_modified'] > self.high_water:
+                self.high_water = record['last_modified']
+
+    def load(self):
+        """Fetch and convert every watched record, then render the first preview."""
+        records = list(self.airtable_client.iter_records(**self.filters))
+        self._update(records)
+        self.order = [record['id'] for record in records]
+        self.render()
+        return len(records)
+
+    def poll(self):
+        """
+        Fetch changes since the last poll and re-render if anything changed.
+
+        Returns:
+            dict: Number of updated and deleted records
+        """
+        # Step back a second: Airtable compares at second precision and IS_AFTER is strict
+        since = self.high_water - timedelta(seconds=1) if self.high_water else None
+        changed = [
+            record for record in self.airtable_client.get_records(modified_since=since, **self.filters)
+            if record['id'] not in self.records or record['last_modified'] != self.records[record['id']]['last_modified']
+        ]
+        order = self.airtable_client.list_record_ids(**self.filters)
+        self._update(changed)
+
+        current = set(order)
+        deleted = [record_id for record_id in self.records if record_id not in current]
+        for record_id in deleted:
+            del self.records[record_id]
+
+        if changed or deleted or order != self.order:
+            self.order = order
+            self.render()
+        return {"updated": len(changed), "deleted": len(deleted)}
+
+    def render(self):
+        # Open pages reload when /__version changes, so the new version is only
+        # published once its preview.html has replaced the previous one
+        version = self.version + 1
+        records = [self.records[record_id] for record_id in self.order if record_id in self.records]
+        path = self.pdf_generator.generate_preview(
+            records, os.path.join(self.output_dir, 'fragments.pdf'), open_browser=False,
+            dedupe=self.dedupe, live_reload=version
+        )
+        if path is None:
+            raise RuntimeError("Preview generation failed")
+        self.version = version
+        for cache in (self.markdown_converter.cache, self.text_fitter.cache if self.text_fitter else None):
+            if cache is not None:
+                cache.flush()
+        return path
+
+    def serve(self, host='127.0.0.1', port=8000):
+        """
+        Serve output_dir over HTTP in a background thread.
+
+        Returns:
+            str: URL of the preview
+        """
+        handler = type('PreviewHandler', (_PreviewHandler,), {'watcher': self})
+        self._server = ThreadingHTTPServer((host, port), partial(handler, directory=self.output_dir))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/preview.html"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def run(self, interval, port=8000):
+        """
+        Load, serve and poll until interrupted with Ctrl+C.
+
+        Args:
+            interval (float): Seconds between polls
+            port (int): Local port of the preview server
+        """
+        count = self.load()
+        print(f"Loaded {count} records")
+        print(f"Serving preview at {self.serve(port=port)} (reloads on change, Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(interval)
+                try:
+                    result = self.poll()
+                except Exception as e:
+                    print(f"Poll failed, retrying in {interval}s: {e}")
+                    continue
+                if result["updated"] or result["deleted"]:
+                    print(f"{time.strftime('%H:%M:%S')} {result['updated']} updated, {result['deleted']} deleted")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()